@@ -1,5 +1,5 @@
 import json
-from utils import hash_password, get_users_table
+from utils import hash_password, get_users_table, is_timezone_name
 import uuid
 
 def lambda_handler(event, context):
@@ -10,6 +10,8 @@ def lambda_handler(event, context):
     email = body.get("email")
     password = body.get("password")
     confirm = body.get("confirm_password")
+    # IANA name such as "Asia/Kolkata"; reminders go out in the user's local morning
+    timezone = body.get("timezone") or "UTC"
     
     # Validate all required fields
     if not (full_name and email and password and confirm):
@@ -35,6 +37,18 @@ def lambda_handler(event, context):
             "body": json.dumps({"error": "Passwords do not match"})
         }
     
+    # Only IANA names; gettz would also take paths and POSIX TZ strings
+    if not is_timezone_name(timezone):
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Headers": "Content-Type",
+                "Content-Type": "application/json"
+            },
+            "body": json.dumps({"error": "Unknown timezone"})
+        }
+    
     table = get_users_table()
     
     # Check if user already exists
@@ -71,7 +85,8 @@ def lambda_handler(event, context):
             "email": email,
             "userId": str(uuid.uuid4()),
             "full_name": full_name,
-            "password": hashed
+            "password": hashed,
+            "timezone": timezone
         })
     except Exception as e:
         print(f"Error creating user: {str(e)}")
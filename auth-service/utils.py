@@ -4,6 +4,7 @@ import hmac
 import jwt
 import os
 from datetime import datetime, timedelta
+from dateutil.zoneinfo import get_zonefile_instance
 
 SECRET = os.environ.get("JWT_SECRET", "mysecretkey")
 
@@ -22,6 +23,10 @@ def generate_jwt(email: str) -> str:
     }
     return jwt.encode(payload, SECRET, algorithm="HS256")
 
+def is_timezone_name(name) -> bool:
+    """True for an IANA timezone name such as "Asia/Kolkata" (not a file path or POSIX TZ string)"""
+    return isinstance(name, str) and name in get_zonefile_instance().zones
+
 def get_users_table():
     dynamodb = boto3.resource("dynamodb")
     return dynamodb.Table("UsersTable")
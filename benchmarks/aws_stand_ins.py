@@ -0,0 +1,311 @@
+"""
+In-memory stand-ins for the AWS APIs the notification job calls.
+
+Only the calls the reminder path makes are implemented, with the same
+request and response shapes (and page limits) as DynamoDB and SNS, and
+every call is counted: date index queries, segmented scans of the whole
+table, BatchGetItem on the users table, the ledger's conditional claims
+and SNS PublishBatch. Events are generated on demand from a compact index
+so million-event datasets fit in a few MB.
+"""
+
+import bisect
+import random
+import threading
+from array import array
+from datetime import datetime, timedelta
+
+from botocore.exceptions import ClientError
+
+# Items per query or scan page; DynamoDB stops at 1 MB, ~4000 events
+QUERY_PAGE_SIZE = 4000
+ITEM_BYTES = 250
+BATCH_GET_LIMIT = 100
+PUBLISH_BATCH_LIMIT = 10
+PUBLISH_BATCH_MAX_BYTES = 256 * 1024
+
+TITLES = ("Team meeting", "Dentist", "Birthday dinner", "Flight to Berlin", "Yoga class", "Project review")
+VENUES = ("Conference room B", "Main street clinic", "Not specified", "Terminal 2", "Community hall")
+
+
+class ApiCounter:
+    """Thread-safe per-API call counter"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def add(self, api, count=1):
+        with self.lock:
+            self.calls[api] = self.calls.get(api, 0) + count
+
+
+class EventDataset:
+    """
+    Synthetic events spread over `days` dates around the target date, with
+    a skewed number of events per user.
+
+    Users are drawn from a Zipf-like distribution (a few users have many
+    events, most have one or two) and dates uniformly, so the target date
+    holds about event_count / days of the table's events. Only each event's
+    user index is stored, per date and sorted the way the date index
+    returns them; the rest of the event is derived from its position when
+    it is read. Table positions run through the dates in order.
+    """
+
+    def __init__(self, event_count, date, days=90, events_per_user=4, skew=1.1, seed=42):
+        rng = random.Random(seed)
+        self.date = date
+        self.user_count = max(1, event_count // events_per_user)
+        cumulative, total = [], 0.0
+        for rank in range(1, self.user_count + 1):
+            total += 1.0 / rank ** skew
+            cumulative.append(total)
+        # Shuffle which user id gets which popularity rank
+        ids = list(range(self.user_count))
+        rng.shuffle(ids)
+        # A third of the dates before the target, so digest windows fit after it
+        first = datetime.strptime(date, "%Y-%m-%d") - timedelta(days=days // 3)
+        self.dates = [(first + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(days)]
+        per_date = [[] for _ in self.dates]
+        for _ in range(event_count):
+            user = ids[min(bisect.bisect_left(cumulative, rng.random() * total), self.user_count - 1)]
+            per_date[rng.randrange(days)].append(user)
+        self.by_date = {}
+        self.offsets = []
+        position = 0
+        for day, users in zip(self.dates, per_date):
+            users.sort()
+            self.by_date[day] = array('I', users)
+            self.offsets.append(position)
+            position += len(users)
+
+    def __len__(self):
+        return self.offsets[-1] + len(self.by_date[self.dates[-1]])
+
+    def users_on(self, date):
+        """User indices with events on a date, one per event, sorted"""
+        return self.by_date.get(date, array('I'))
+
+    @staticmethod
+    def email(user):
+        return f"user{user:07d}@example.com"
+
+    def item(self, date, position):
+        """Event at a position of a date's index entries, as plain attributes"""
+        user = self.by_date[date][position]
+        return {
+            'userId': self.email(user),
+            'title': f"{TITLES[position % len(TITLES)]} #{position}",
+            'date': date,
+            'time': f"{8 + position % 12:02d}:{(position % 4) * 15:02d}",
+            'venue': VENUES[position % len(VENUES)],
+            'details': f"Synthetic event {position} for load testing the reminder job."
+        }
+
+    def wire_item(self, date, position):
+        return {name: {'S': value} for name, value in self.item(date, position).items()}
+
+    def locate(self, table_position):
+        """(date, position within the date) of a position in the whole table"""
+        day = bisect.bisect_right(self.offsets, table_position) - 1
+        return self.dates[day], table_position - self.offsets[day]
+
+
+class StandInDynamoClient:
+    """Low-level DynamoDB client: date index queries and ledger calls"""
+
+    def __init__(self, dataset, counter):
+        self.dataset = dataset
+        self.counter = counter
+        self.ledger = {}
+        self.lock = threading.Lock()
+
+    def query(self, TableName, ExpressionAttributeValues, ExclusiveStartKey=None, Limit=None, **kwargs):
+        self.counter.add('dynamodb.Query')
+        date = ExpressionAttributeValues.get(':date', {}).get('S')
+        users = self.dataset.users_on(date)
+        if ExclusiveStartKey:
+            start = int(ExclusiveStartKey['position']['N'])
+        elif ':after' in ExpressionAttributeValues:
+            # Digest runs resume after a user: "userId > :after"
+            after = ExpressionAttributeValues[':after']['S']
+            start = bisect.bisect_right(users, int(after[4:11]))
+        else:
+            start = 0
+        end = min(start + (Limit or QUERY_PAGE_SIZE), len(users))
+        items = [self.dataset.wire_item(date, position) for position in range(start, end)]
+        response = {
+            'Items': items,
+            'Count': len(items),
+            'ScannedCount': len(items),
+            # Eventually consistent reads of ~250 byte items: 0.5 RCU per 4 KB
+            'ConsumedCapacity': {'TableName': TableName, 'CapacityUnits': len(items) * ITEM_BYTES / 4096 / 2}
+        }
+        if end < len(users):
+            response['LastEvaluatedKey'] = {'position': {'N': str(end)}}
+        return response
+
+    # Sent-reminder ledger (ledger.ReminderLedger)
+
+    def batch_get_item(self, RequestItems):
+        self.counter.add('dynamodb.BatchGetItem (ledger)')
+        responses = {}
+        for table, request in RequestItems.items():
+            with self.lock:
+                responses[table] = [
+                    self.ledger[key['ledgerKey']['S']]
+                    for key in request['Keys'] if key['ledgerKey']['S'] in self.ledger
+                ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        self.counter.add('dynamodb.PutItem (ledger)')
+        key = Item['ledgerKey']['S']
+        with self.lock:
+            existing = self.ledger.get(key)
+            if ConditionExpression and not claim_condition_holds(existing, ConditionExpression,
+                                                                 ExpressionAttributeValues or {}):
+                raise ClientError(
+                    {'Error': {'Code': 'ConditionalCheckFailedException',
+                               'Message': 'The conditional request failed'}},
+                    'PutItem'
+                )
+            self.ledger[key] = Item
+
+    def batch_write_item(self, RequestItems):
+        self.counter.add('dynamodb.BatchWriteItem (ledger)')
+        with self.lock:
+            for requests in RequestItems.values():
+                for request in requests:
+                    item = request['PutRequest']['Item']
+                    self.ledger[item['ledgerKey']['S']] = item
+        return {'UnprocessedItems': {}}
+
+    def delete_item(self, TableName, Key):
+        self.counter.add('dynamodb.DeleteItem (ledger)')
+        with self.lock:
+            self.ledger.pop(Key['ledgerKey']['S'], None)
+
+
+def claim_condition_holds(existing, expression, values):
+    """
+    Evaluate the ledger's claim condition against the current item:
+    "attribute_not_exists(ledgerKey)", optionally "OR (#st = :sending AND
+    claimedAt < :stale)" for taking over a stale claim.
+    """
+    if not expression.startswith('attribute_not_exists(ledgerKey)'):
+        raise ValueError(f"Unsupported ConditionExpression: {expression}")
+    if existing is None:
+        return True
+    if ':stale' not in values:
+        return False
+    return (existing['status']['S'] == values[':sending']['S']
+            and int(existing['claimedAt']['N']) < int(values[':stale']['N']))
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class StandInTable:
+    """Just enough of a boto3 Table for query_pages (name and meta.client)"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.meta = _Meta(client)
+
+
+class StandInScanTable:
+    """
+    boto3 Table for parallel_scan: Segment/TotalSegments scans of every event
+    in the table, filtered on date. Every item scanned is paid for, whether
+    or not it passes the filter.
+    """
+
+    def __init__(self, dataset, counter):
+        self.dataset = dataset
+        self.counter = counter
+
+    def scan(self, Segment, TotalSegments, ExpressionAttributeValues, ExclusiveStartKey=None, **kwargs):
+        self.counter.add('dynamodb.Scan')
+        total = len(self.dataset)
+        segment_end = total * (Segment + 1) // TotalSegments
+        start = int(ExclusiveStartKey['position']) if ExclusiveStartKey else total * Segment // TotalSegments
+        end = min(start + QUERY_PAGE_SIZE, segment_end)
+        first = ExpressionAttributeValues.get(':date', ExpressionAttributeValues.get(':first'))
+        last = ExpressionAttributeValues.get(':date', ExpressionAttributeValues.get(':last'))
+
+        items = []
+        position = start
+        while position < end:
+            date, offset = self.dataset.locate(position)
+            count = min(end - position, len(self.dataset.users_on(date)) - offset)
+            if first <= date <= last:
+                items.extend(self.dataset.item(date, offset + i) for i in range(count))
+            position += count
+        response = {
+            'Items': items,
+            'Count': len(items),
+            'ScannedCount': end - start,
+            'ConsumedCapacity': {'TableName': 'EventsTable', 'CapacityUnits': (end - start) * ITEM_BYTES / 4096 / 2}
+        }
+        if end < segment_end:
+            response['LastEvaluatedKey'] = {'position': end}
+        return response
+
+
+class StandInDynamoResource:
+    """boto3 DynamoDB resource: BatchGetItem on the users table, and scannable tables"""
+
+    def __init__(self, client, counter):
+        self.meta = _Meta(client)
+        self.counter = counter
+
+    def Table(self, name):
+        return StandInScanTable(self.meta.client.dataset, self.counter)
+
+    def batch_get_item(self, RequestItems):
+        self.counter.add('dynamodb.BatchGetItem (users)')
+        responses = {}
+        for table, request in RequestItems.items():
+            if len(request['Keys']) > BATCH_GET_LIMIT:
+                raise ValueError("Too many items requested for the BatchGetItem call")
+            responses[table] = [
+                {'email': key['email'], 'full_name': f"User {key['email'][4:11].lstrip('0') or '0'}"}
+                for key in request['Keys']
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class StandInSNS:
+    """SNS client that accepts every message, optionally after a delay"""
+
+    def __init__(self, counter, latency=0.0):
+        self.counter = counter
+        self.latency = latency
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        if len(PublishBatchRequestEntries) > PUBLISH_BATCH_LIMIT:
+            raise ValueError("Too many entries in the PublishBatch call")
+        payload = sum(
+            len(entry['Message'].encode()) + len(entry.get('Subject', '').encode())
+            + sum(len(name.encode()) + len(attribute['DataType'].encode())
+                  + len(attribute.get('StringValue', '').encode())
+                  for name, attribute in entry.get('MessageAttributes', {}).items())
+            for entry in PublishBatchRequestEntries
+        )
+        if payload > PUBLISH_BATCH_MAX_BYTES:
+            raise ValueError("Total size of the PublishBatch request exceeds 262144 bytes")
+        self.counter.add('sns.PublishBatch')
+        if self.latency:
+            threading.Event().wait(self.latency)
+        with self.lock:
+            self.messages += len(PublishBatchRequestEntries)
+        return {
+            'Successful': [{'Id': entry['Id'], 'MessageId': entry['Id']} for entry in PublishBatchRequestEntries],
+            'Failed': []
+        }
@@ -0,0 +1,81 @@
+"""
+Memory benchmark: boto3 resource item dicts vs compact EventRecords.
+
+Builds N events in DynamoDB wire format (what a query page returns), then
+measures the memory held and conversion time for:
+
+  * dicts, deserialized the way boto3 resources do (TypeDeserializer)
+  * EventRecord.from_wire
+
+Both keep the attribute strings from the response, so the figures are the
+per-event overhead on top of the text itself.
+
+    python benchmarks/event_record_memory.py --events 50000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "notify-service"))
+
+from boto3.dynamodb.types import TypeDeserializer
+from event_record import EventRecord
+
+
+def wire_events(count, users=None, date="2025-01-15"):
+    """Synthetic wire-format events, ~3 per user, as a date index query returns them"""
+    users = users or max(1, count // 3)
+    return [
+        {
+            'userId': {'S': f"user{i % users:06d}@example.com"},
+            'eventId': {'S': f"{i:08x}-5f1c-4a57-9e0b-{i:012x}"},
+            'title': {'S': f"Team meeting {i}"},
+            'date': {'S': date},
+            'time': {'S': f"{9 + i % 9:02d}:{(i % 4) * 15:02d}"},
+            'venue': {'S': "Conference room B"},
+            'details': {'S': "Quarterly planning with the product and platform teams."},
+            'offsetMinutes': {'N': str((15, 60, 1440)[i % 3])}
+        }
+        for i in range(count)
+    ]
+
+
+def measure(label, convert, items):
+    """Convert every item and report bytes held per event and conversion rate"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    converted = [convert(item) for item in items]
+    elapsed = time.perf_counter() - started
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_event = held / len(items)
+    print(f"{label:<22} {per_event:8.0f} bytes/event  "
+          f"{len(items) / elapsed:10.0f} events/s  ({held / 1024 / 1024:.1f} MiB total)")
+    del converted
+    return per_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory use of event representations")
+    parser.add_argument("--events", type=int, default=50000, help="number of events")
+    args = parser.parse_args()
+
+    items = wire_events(args.events)
+    deserializer = TypeDeserializer()
+
+    print(f"{args.events} events")
+    before = measure("resource dict", lambda item: {
+        key: deserializer.deserialize(value) for key, value in item.items()
+    }, items)
+    after = measure("EventRecord", EventRecord.from_wire, items)
+    print(f"EventRecord holds {before / after:.1f}x less memory per event")
+
+
+if __name__ == "__main__":
+    main()
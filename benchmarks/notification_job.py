@@ -0,0 +1,228 @@
+"""
+Offline benchmark of the daily notification job.
+
+Runs notification.lambda_handler end to end against the in-memory
+DynamoDB and SNS stand-ins in aws_stand_ins.py, on synthetic tables of
+--events events spread over --days dates with a skewed number of events
+per user, and reports per phase:
+
+  read     date index query pages (or with --scan, a segmented scan of the
+           whole table) -> EventRecords (includes the stand-in building
+           each page, roughly what boto3 spends parsing one)
+  lookup   user profile BatchGetItem (and ledger checks with --ledger)
+  render   building the email for each user
+  publish  SNS PublishBatch calls (summed over the publisher threads)
+
+with wall time, API calls, and the run's peak traced memory. Reading
+through the date index costs what tomorrow's events cost; a scan costs
+the whole table, which comparing the two shows. No AWS account or network
+is used; the SNS rate limit is lifted unless --publish-rate is given, so
+the figures are the job's own CPU cost.
+
+    PYTHONPATH=auth-service/package python benchmarks/notification_job.py
+    python benchmarks/notification_job.py --events 10000 100000 --ledger --json
+    python benchmarks/notification_job.py --events 1000000 --scan
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "notify-service"))
+
+RUN_TIME = "2025-01-13T08:00:00Z"  # a Monday, when weekly digests go out
+TARGET_DATE = "2025-01-14"
+
+
+def configure(args):
+    """Environment notification.py reads at import time"""
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ["EVENTS_DATE_INDEX"] = "" if args.scan else "DateIndex"
+    os.environ["REMINDER_SCHEDULE_TABLE"] = ""
+    os.environ["REMINDER_QUEUE_URL"] = ""
+    os.environ["CHECKPOINT_TABLE"] = ""
+    os.environ["LEDGER_TABLE"] = ""
+    os.environ["DAILY_REMINDER_HOUR"] = "8"
+    os.environ["DIGEST_DAYS"] = str(args.digest_days)
+    os.environ["SNS_TOPIC_ARN"] = "arn:aws:sns:us-east-1:000000000000:benchmark"
+    os.environ["SNS_PUBLISH_RATE"] = str(args.publish_rate)
+    os.environ["PUBLISH_WORKERS"] = str(args.workers)
+
+
+class PhaseTimer:
+    """Accumulates time spent inside wrapped functions, per phase"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = {}
+
+    def add(self, phase, seconds):
+        with self.lock:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+
+    def wrap(self, phase, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - started)
+        return timed
+
+    def wrap_generator(self, phase, func):
+        """Time only while the generator is producing, not while it is suspended"""
+        def timed(*args, **kwargs):
+            items = func(*args, **kwargs)
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    self.add(phase, time.perf_counter() - started)
+                yield item
+        return timed
+
+
+def run_once(notification, event_count, args):
+    """Run the job once over a fresh dataset and return its measurements"""
+    from aws_stand_ins import (ApiCounter, EventDataset, StandInDynamoClient,
+                               StandInDynamoResource, StandInSNS, StandInTable)
+    from ledger import ReminderLedger
+
+    dataset = EventDataset(event_count, TARGET_DATE, days=args.days, skew=args.skew, seed=args.seed)
+    counter = ApiCounter()
+    client = StandInDynamoClient(dataset, counter)
+    sns = StandInSNS(counter, latency=args.sns_latency_ms / 1000.0)
+    timer = PhaseTimer()
+
+    originals = {
+        name: getattr(notification, name)
+        for name in ("dynamodb", "sns", "events_table", "schedule_table", "ledger",
+                     "reminder_queue", "parallel_scan", "iter_events_for_date", "iter_events_for_days",
+                     "fetch_user_profiles", "render_notification", "send_notification_batch")
+    }
+    notification.dynamodb = StandInDynamoResource(client, counter)
+    notification.parallel_scan = functools.partial(originals["parallel_scan"],
+                                                   table_factory=notification.dynamodb.Table)
+    notification.sns = sns
+    notification.events_table = StandInTable("EventsTable", client)
+    notification.schedule_table = None
+    notification.reminder_queue = None
+    notification.ledger = ReminderLedger(client, "ReminderLedgerTable") if args.ledger else None
+    notification.iter_events_for_date = timer.wrap_generator("read", originals["iter_events_for_date"])
+    notification.iter_events_for_days = timer.wrap_generator("read", originals["iter_events_for_days"])
+    notification.fetch_user_profiles = timer.wrap("lookup", originals["fetch_user_profiles"])
+    notification.render_notification = timer.wrap("render", originals["render_notification"])
+    notification.send_notification_batch = timer.wrap("publish", originals["send_notification_batch"])
+    if notification.ledger:
+        notification.ledger.sent_reminders = timer.wrap("lookup", notification.ledger.sent_reminders)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    log = io.StringIO() if args.verbose else open(os.devnull, "w")
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            response = notification.lambda_handler({"time": RUN_TIME}, None)
+    finally:
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+        for name, value in originals.items():
+            setattr(notification, name, value)
+        if not args.verbose:
+            log.close()
+
+    if args.verbose:
+        print(log.getvalue())
+    body = json.loads(response["body"])
+    if response["statusCode"] != 200:
+        raise RuntimeError(f"Notification run failed: {body}")
+    return {
+        "events": event_count,
+        "target_date_events": len(dataset.users_on(TARGET_DATE)),
+        "users": len(set(dataset.users_on(TARGET_DATE))),
+        "read_path": "scan" if args.scan else "index",
+        "notifications_sent": body.get("notifications_sent"),
+        "messages_published": sns.messages,
+        # What DynamoDB bills: every item a scan reads, not just those it returns
+        "items_read": body.get("total_events"),
+        "read_capacity_units": round(body.get("consumed_read_units", 0), 1),
+        "wall_seconds": round(wall, 3),
+        "events_per_second": round(event_count / wall),
+        "phase_seconds": {phase: round(seconds, 3) for phase, seconds in sorted(timer.seconds.items())},
+        "api_calls": dict(sorted(counter.calls.items())),
+        "peak_traced_mib": round(peak / 1024 / 1024, 1) if peak is not None else None,
+        # Linux reports KiB; includes the interpreter and the dataset index
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def print_report(result):
+    print(f"\n{result['events']} events ({result['target_date_events']} on {TARGET_DATE}, "
+          f"{result['users']} users, read by {result['read_path']}) -> "
+          f"{result['notifications_sent']} notifications "
+          f"({result['wall_seconds']:.2f}s, {result['events_per_second']} events/s)")
+    print(f"  items read {result['items_read']}, {result['read_capacity_units']} RCUs")
+    for phase in ("read", "lookup", "render", "publish"):
+        seconds = result["phase_seconds"].get(phase, 0.0)
+        share = 100 * seconds / result["wall_seconds"] if result["wall_seconds"] else 0
+        print(f"  {phase:<8} {seconds:8.3f}s  {share:5.1f}% of wall")
+    for api, calls in result["api_calls"].items():
+        print(f"  {api:<34} {calls:8d} calls")
+    if result["peak_traced_mib"] is not None:
+        print(f"  peak traced memory {result['peak_traced_mib']} MiB")
+    print(f"  max RSS so far     {result['max_rss_mib']} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the notification job against in-memory AWS stand-ins")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="dataset sizes to run (default: 10k 100k 1M)")
+    parser.add_argument("--days", type=int, default=90,
+                        help="dates the table's events are spread over (default: 90)")
+    parser.add_argument("--scan", action="store_true",
+                        help="read by scanning the table instead of the date index")
+    parser.add_argument("--skew", type=float, default=1.1,
+                        help="Zipf exponent of events per user (higher is more skewed)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ledger", action="store_true", help="enable the sent-reminder ledger")
+    parser.add_argument("--digest-days", type=int, default=0,
+                        help="DIGEST_DAYS; >0 makes it a digest run reading that many days (default: 0)")
+    parser.add_argument("--workers", type=int, default=16, help="PUBLISH_WORKERS")
+    parser.add_argument("--publish-rate", type=float, default=1e9,
+                        help="SNS_PUBLISH_RATE in messages/s (default: effectively unlimited)")
+    parser.add_argument("--sns-latency-ms", type=float, default=0.0,
+                        help="simulated latency of each PublishBatch call")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace peak Python memory of the run (slows it down ~2x)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    parser.add_argument("--verbose", action="store_true", help="show the job's own log output")
+    args = parser.parse_args()
+
+    configure(args)
+    import notification
+
+    for event_count in args.events:
+        result = run_once(notification, event_count, args)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark: events Lambda response bodies, old encoding vs json_body.
+
+Builds N events the way the boto3 resource API returns them (numbers as
+Decimal), then times turning a GET /events page of them into a response
+body:
+
+  three-pass   json.loads(json.dumps(items, default=decimal_default)) to
+               swap Decimals for floats, then json.dumps for the body
+  json_body    json_body.dumps, writing the Decimals directly
+
+    PYTHONPATH=auth-service/package python benchmarks/response_encoding.py
+    python benchmarks/response_encoding.py --events 1000 10000 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "event-service"))
+
+from json_body import dumps
+
+
+def resource_events(count):
+    """Synthetic events as a Query through the resource API returns them"""
+    return [
+        {
+            'userId': f"user{i % 500:04d}@example.com",
+            'eventId': f"{i:08x}-5f1c-4a57-9e0b-{i:012x}",
+            'title': f"Team meeting {i}",
+            'date': f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            'time': f"{9 + i % 9:02d}:{(i % 4) * 15:02d}",
+            'venue': "Conference room B",
+            'details': "Quarterly planning with the product and platform teams.",
+            'reminderOffsets': [Decimal(15), Decimal(60)] if i % 2 else [],
+            'createdAt': Decimal(1736000000 + i),
+            'updatedAt': Decimal(1736000000 + i)
+        }
+        for i in range(count)
+    ]
+
+
+def decimal_default(obj):
+    """The conversion events.py used before json_body"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+def three_pass(items):
+    items = json.loads(json.dumps(items, default=decimal_default))
+    return json.dumps({"items": items, "count": len(items), "nextCursor": None})
+
+
+def one_pass(items):
+    return dumps({"items": items, "count": len(items), "nextCursor": None})
+
+
+def best_time(encode, items, repeat):
+    """Fastest of `repeat` runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(items)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response body encodings")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000], help="payload sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    for count in args.events:
+        items = resource_events(count)
+        before = best_time(three_pass, items, args.repeat)
+        after = best_time(one_pass, items, args.repeat)
+        size = len(one_pass(items))
+        print(f"{count:>7} events ({size / 1024:.0f} KiB)  "
+              f"three-pass {before * 1000:8.2f} ms  json_body {after * 1000:8.2f} ms  "
+              f"{before / after:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,178 @@
+import base64
+import hashlib
+import hmac
 import json
 import boto3
 import uuid
 import jwt
 import os
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
 from datetime import datetime
-from decimal import Decimal
+from json_body import dumps, to_json_value
+from request_log import logger
+from token_cache import TokenCache
+from transactions import is_conflict
+from reminders import (REMINDER_SCHEDULE_TABLE, build_reminder_items, fetch_user_timezone,
+                       parse_reminder_offsets, reminder_keys)
 
 # Environment variables
 SECRET = os.environ.get("JWT_SECRET", "mysecretkey")
 EVENTS_TABLE = os.environ.get("EVENTS_TABLE", "EventsTable")
+# Global index on (userId, date) for date-range and date-ordered listings
+EVENTS_USER_DATE_INDEX = os.environ.get("EVENTS_USER_DATE_INDEX", "UserDateIndex")
+USERS_TABLE = os.environ.get("USERS_TABLE", "UsersTable")
+# Event counters kept up to date by stream_consumer.py
+EVENT_STATS_TABLE = os.environ.get("EVENT_STATS_TABLE", "EventStatsTable")
+# Key for signing GET /events page cursors (defaults to the JWT secret)
+CURSOR_SECRET = os.environ.get("CURSOR_SECRET", SECRET)
+
+# GET /events page size: ?limit= defaults to DEFAULT_PAGE_SIZE, at most MAX_PAGE_SIZE
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "100"))
+
+# Verified tokens kept per warm container (0 turns the cache off)
+JWT_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "1024"))
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(EVENTS_TABLE)
+users_table = dynamodb.Table(USERS_TABLE)
+stats_table = dynamodb.Table(EVENT_STATS_TABLE)
+
+# Transactions go through the low-level client, which takes wire-format items
+dynamodb_client = dynamodb.meta.client
+serializer = TypeSerializer()
+
+token_cache = TokenCache(max_size=JWT_CACHE_SIZE)
+
+def to_wire(item):
+    """Convert a plain item to DynamoDB wire format"""
+    return {key: serializer.serialize(value) for key, value in item.items()}
+
+def get_user_timezone(user_email):
+    """User's IANA timezone name from their profile (None if not set)"""
+    try:
+        return fetch_user_timezone(users_table, user_email)
+    except Exception as e:
+        logger.warning("Could not fetch timezone", userId=user_email, error=str(e))
+        return None
+
+def reminder_writes(old_item, new_item):
+    """
+    Transaction actions that move an event's reminder rows from old_item's
+    schedule slots to new_item's (either may be None).
+    """
+    actions = []
+    timezone_name = get_user_timezone((old_item or new_item)['userId'])
+    old_keys = reminder_keys(old_item, timezone_name) if old_item else []
+    new_reminders = build_reminder_items(new_item, timezone_name) if new_item else []
+    
+    # A Put on the same key already replaces the old row
+    new_keys = [{'bucket': r['bucket'], 'reminderId': r['reminderId']} for r in new_reminders]
+    for old_key in old_keys:
+        if old_key not in new_keys:
+            actions.append({'Delete': {'TableName': REMINDER_SCHEDULE_TABLE, 'Key': to_wire(old_key)}})
+    
+    for reminder in new_reminders:
+        actions.append({'Put': {'TableName': REMINDER_SCHEDULE_TABLE, 'Item': to_wire(reminder)}})
+    
+    return actions
+
+def version_condition(existing):
+    """
+    Optimistic-lock condition on the version the event was read at, with
+    its names and values. Events saved before versions were added have
+    none, so they match on the attribute still being absent.
+    """
+    if existing.get('version') is None:
+        return 'attribute_not_exists(#ver)', {'#ver': 'version'}, {}
+    return '#ver = :version', {'#ver': 'version'}, {':version': existing['version']}
+
+def sign_cursor(payload):
+    """Base64 HMAC-SHA256 of a cursor payload"""
+    digest = hmac.new(CURSOR_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+def query_shape(date_range):
+    """What a cursor is bound to besides its key: [from, to, order] of a date listing, or None"""
+    if not date_range:
+        return None
+    date_from, date_to, ascending = date_range
+    return [date_from, date_to, 'asc' if ascending else 'desc']
+
+def encode_cursor(last_key, shape=None):
+    """
+    Opaque page cursor for a query's LastEvaluatedKey and query_shape:
+    base64 JSON, '.', signature
+    """
+    payload = base64.urlsafe_b64encode(
+        json.dumps({'key': last_key, 'query': shape}, sort_keys=True, separators=(',', ':'),
+                   default=to_json_value).encode()
+    ).decode().rstrip('=')
+    return f"{payload}.{sign_cursor(payload)}"
+
+def decode_cursor(cursor, user_email, shape=None):
+    """
+    ExclusiveStartKey from a page cursor.
+    
+    Raises ValueError if the cursor was not issued by this service, or was
+    issued for another user or another query (a different date range or
+    order), whose bounds its key may lie outside.
+    """
+    payload, _, signature = (cursor or '').partition('.')
+    if not payload or not hmac.compare_digest(signature.encode(), sign_cursor(payload).encode()):
+        raise ValueError("Invalid cursor")
+    try:
+        state = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    last_key = state.get('key') if isinstance(state, dict) else None
+    if not isinstance(last_key, dict) or last_key.get('userId') != user_email:
+        raise ValueError("Invalid cursor")
+    if state.get('query') != shape:
+        raise ValueError("Cursor was issued for a different from/to/order")
+    return last_key
+
+def parse_page_size(value):
+    """?limit= as an int between 1 and MAX_PAGE_SIZE (DEFAULT_PAGE_SIZE if missing)"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be a whole number between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+def parse_date_range(query_params):
+    """
+    (from, to, ascending) for a date-ordered listing, or None if the
+    request has none of ?from=, ?to= or ?order=.
+    
+    Dates are YYYY-MM-DD and either end may be left open; order is 'asc'
+    (upcoming first, the default) or 'desc'.
+    """
+    if not any(query_params.get(name) for name in ('from', 'to', 'order')):
+        return None
+    
+    bounds = []
+    for name in ('from', 'to'):
+        value = query_params.get(name) or None
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+        bounds.append(value)
+    date_from, date_to = bounds
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("from must not be after to")
+    
+    order = query_params.get('order') or 'asc'
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    return date_from, date_to, order == 'asc'
 
 def cors_headers():
     """Return CORS headers for all responses"""
@@ -27,18 +188,25 @@ def response(status_code, body):
     return {
         "statusCode": status_code,
         "headers": cors_headers(),
-        "body": json.dumps(body)
+        "body": dumps(body)
     }
 
 def verify_jwt(token):
-    """Verify and decode JWT token"""
+    """Verify and decode JWT token (warm containers reuse earlier results)"""
     try:
         # Remove 'Bearer ' prefix if present
         if token.startswith('Bearer '):
             token = token[7:]
         
+        email = token_cache.get(token)
+        if email:
+            return email
+        
         payload = jwt.decode(token, SECRET, algorithms=['HS256'])
-        return payload.get('email')
+        email = payload.get('email')
+        token_cache.put(token, email, payload.get('exp'))
+        logger.debug("Verified token", **token_cache.stats())
+        return email
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
@@ -61,7 +229,7 @@ def get_user_email_from_event(event):
 def lambda_handler(event, context):
     """Main Lambda handler for Events CRUD operations"""
     
-    print(f"Received event: {json.dumps(event)}")
+    logger.start_request(event, context)
     
     # Handle OPTIONS for CORS
     if event.get('httpMethod') == 'OPTIONS':
@@ -76,7 +244,10 @@ def lambda_handler(event, context):
     
     try:
         if http_method == 'GET':
-            return handle_get_events(user_email)
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('summary') == 'true':
+                return handle_get_summary(user_email)
+            return handle_get_events(user_email, query_params)
         
         elif http_method == 'POST':
             return handle_create_event(user_email, event)
@@ -91,36 +262,107 @@ def lambda_handler(event, context):
             return response(405, {"error": f"Method {http_method} not allowed"})
     
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error("Unhandled error", method=http_method, error=str(e))
         return response(500, {"error": f"Internal server error: {str(e)}"})
 
-def handle_get_events(user_email):
-    """GET /events - Fetch all events for user"""
+def handle_get_events(user_email, query_params=None):
+    """
+    GET /events?limit=&cursor=&from=&to=&order= - One page of the user's events
+    
+    Returns up to `limit` events and a nextCursor to pass back as `cursor`
+    for the next page (None after the last page). A page can come back
+    short, or even empty, before the last one.
+    
+    With from/to (YYYY-MM-DD, inclusive) or order (asc/desc), the events
+    are read in date order from the user-date index, and only the ones in
+    range are read at all.
+    """
+    query_params = query_params or {}
     try:
-        # Query DynamoDB for all events belonging to this user
-        result = table.query(
-            KeyConditionExpression='userId = :uid',
-            ExpressionAttributeValues={
+        limit = parse_page_size(query_params.get('limit'))
+        date_range = parse_date_range(query_params)
+        shape = query_shape(date_range)
+        # Cursors only continue the query they came from
+        start_key = (decode_cursor(query_params['cursor'], user_email, shape)
+                     if query_params.get('cursor') else None)
+    except ValueError as e:
+        return response(400, {"error": str(e)})
+    
+    try:
+        # Only this page's events are read, however many the user has
+        query_kwargs = {
+            'KeyConditionExpression': 'userId = :uid',
+            'ExpressionAttributeValues': {
                 ':uid': user_email
-            }
-        )
+            },
+            'Limit': limit
+        }
+        if date_range:
+            date_from, date_to, ascending = date_range
+            query_kwargs['IndexName'] = EVENTS_USER_DATE_INDEX
+            query_kwargs['ScanIndexForward'] = ascending
+            if date_from and date_to:
+                query_kwargs['KeyConditionExpression'] += ' AND #dt BETWEEN :from AND :to'
+            elif date_from:
+                query_kwargs['KeyConditionExpression'] += ' AND #dt >= :from'
+            elif date_to:
+                query_kwargs['KeyConditionExpression'] += ' AND #dt <= :to'
+            if date_from or date_to:
+                query_kwargs['ExpressionAttributeNames'] = {'#dt': 'date'}  # 'date' is reserved word
+            if date_from:
+                query_kwargs['ExpressionAttributeValues'][':from'] = date_from
+            if date_to:
+                query_kwargs['ExpressionAttributeValues'][':to'] = date_to
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = start_key
+        result = table.query(**query_kwargs)
         
         items = result.get('Items', [])
+        last_key = result.get('LastEvaluatedKey')
         
-        # Convert Decimal to float for JSON serialization
-        items = json.loads(json.dumps(items, default=decimal_default))
-        
-        print(f"Found {len(items)} events for user {user_email}")
+        logger.info("Fetched events", userId=user_email, count=len(items))
         
         return response(200, {
             "items": items,
-            "count": len(items)
+            "count": len(items),
+            "nextCursor": encode_cursor(last_key, shape) if last_key else None
         })
     
     except Exception as e:
-        print(f"Error fetching events: {str(e)}")
+        logger.error("Failed to fetch events", userId=user_email, error=str(e))
         return response(500, {"error": f"Failed to fetch events: {str(e)}"})
 
+def handle_get_summary(user_email):
+    """GET /events?summary=true - Event counts for user, without reading the events"""
+    try:
+        # Counters are maintained from the events stream, so they may lag
+        # a write by a second or so
+        result = stats_table.query(
+            KeyConditionExpression='userId = :uid AND begins_with(statKey, :prefix)',
+            ExpressionAttributeValues={
+                ':uid': user_email,
+                ':prefix': 'count#'
+            }
+        )
+        
+        total = 0
+        months = {}
+        for row in result.get('Items', []):
+            period = row['statKey'][len('count#'):]
+            if period == 'total':
+                total = int(row.get('eventCount', 0))
+            elif row.get('eventCount'):
+                months[period] = int(row['eventCount'])
+        
+        return response(200, {
+            "count": total,
+            "months": months
+        })
+    
+    except Exception as e:
+        logger.error("Failed to fetch event summary", userId=user_email, error=str(e))
+        return response(500, {"error": f"Failed to fetch event summary: {str(e)}"})
+
 def handle_create_event(user_email, event):
     """POST /events - Create new event"""
     try:
@@ -137,6 +379,10 @@ def handle_create_event(user_email, event):
         # Optional fields
         time = body.get('time', '').strip()
         venue = body.get('venue', '').strip()
+        try:
+            reminder_offsets = parse_reminder_offsets(body.get('reminderOffsets'))
+        except ValueError as e:
+            return response(400, {"error": str(e)})
         
         # Generate unique event ID
         event_id = str(uuid.uuid4())
@@ -153,14 +399,18 @@ def handle_create_event(user_email, event):
             'time': time if time else 'Not specified',
             'venue': venue if venue else 'Not specified',
             'details': details,
+            'reminderOffsets': reminder_offsets,
             'createdAt': timestamp,
-            'updatedAt': timestamp
+            'updatedAt': timestamp,
+            'version': 1
         }
         
-        # Save to DynamoDB
-        table.put_item(Item=item)
+        # Save the event and its reminder row atomically
+        dynamodb_client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': EVENTS_TABLE, 'Item': to_wire(item)}}
+        ] + reminder_writes(None, item))
         
-        print(f"Created event {event_id} for user {user_email}")
+        logger.info("Created event", userId=user_email, eventId=event_id)
         
         return response(201, {
             "message": "Event created successfully",
@@ -168,7 +418,7 @@ def handle_create_event(user_email, event):
         })
     
     except Exception as e:
-        print(f"Error creating event: {str(e)}")
+        logger.error("Failed to create event", userId=user_email, error=str(e))
         return response(500, {"error": f"Failed to create event: {str(e)}"})
 
 def handle_update_event(user_email, event):
@@ -180,10 +430,28 @@ def handle_update_event(user_email, event):
         if not event_id:
             return response(400, {"error": "Missing eventId"})
         
-        # Build update expression
-        update_expr = "SET updatedAt = :updated"
-        expr_values = {':updated': int(datetime.now().timestamp())}
-        expr_names = {}
+        key = {
+            'userId': user_email,
+            'eventId': event_id
+        }
+        
+        if 'reminderOffsets' in body:
+            try:
+                body['reminderOffsets'] = parse_reminder_offsets(body['reminderOffsets'])
+            except ValueError as e:
+                return response(400, {"error": str(e)})
+        
+        # Current item tells us which reminder rows to move
+        existing = table.get_item(Key=key).get('Item')
+        if not existing:
+            return response(404, {"error": "Event not found"})
+        
+        # Build update expression; every write bumps the version the next
+        # writer's condition is checked against
+        condition, expr_names, expr_values = version_condition(existing)
+        update_expr = "SET updatedAt = :updated, #ver = :next"
+        expr_values[':updated'] = int(datetime.now().timestamp())
+        expr_values[':next'] = int(existing.get('version') or 0) + 1
         
         # Update fields if provided
         if 'title' in body:
@@ -208,20 +476,36 @@ def handle_update_event(user_email, event):
             update_expr += ", details = :details"
             expr_values[':details'] = body['details']
         
-        # Update the item
-        result = table.update_item(
-            Key={
-                'userId': user_email,
-                'eventId': event_id
-            },
-            UpdateExpression=update_expr,
-            ExpressionAttributeValues=expr_values,
-            ExpressionAttributeNames=expr_names if expr_names else None,
-            ReturnValues='ALL_NEW'
-        )
+        if 'reminderOffsets' in body:
+            update_expr += ", reminderOffsets = :offsets"
+            expr_values[':offsets'] = body['reminderOffsets']
+        
+        updated_item = dict(existing)
+        updated_item['updatedAt'] = expr_values[':updated']
+        updated_item['version'] = expr_values[':next']
+        for field in ('title', 'date', 'time', 'venue', 'details', 'reminderOffsets'):
+            if field in body:
+                updated_item[field] = body[field]
+        
+        # Update the event and move its reminders in one transaction; the
+        # condition fails if someone else changed the event since we read it
+        update = {
+            'TableName': EVENTS_TABLE,
+            'Key': to_wire(key),
+            'UpdateExpression': update_expr,
+            'ConditionExpression': condition,
+            'ExpressionAttributeNames': expr_names,
+            'ExpressionAttributeValues': to_wire(expr_values)
+        }
         
-        updated_item = result.get('Attributes', {})
-        updated_item = json.loads(json.dumps(updated_item, default=decimal_default))
+        try:
+            dynamodb_client.transact_write_items(
+                TransactItems=[{'Update': update}] + reminder_writes(existing, updated_item)
+            )
+        except ClientError as e:
+            if is_conflict(e):
+                return response(409, {"error": "Event was modified concurrently, please retry"})
+            raise
         
         return response(200, {
             "message": "Event updated successfully",
@@ -229,7 +513,7 @@ def handle_update_event(user_email, event):
         })
     
     except Exception as e:
-        print(f"Error updating event: {str(e)}")
+        logger.error("Failed to update event", userId=user_email, error=str(e))
         return response(500, {"error": f"Failed to update event: {str(e)}"})
 
 def handle_delete_event(user_email, event):
@@ -250,15 +534,33 @@ def handle_delete_event(user_email, event):
         if not event_id:
             return response(400, {"error": "eventId is required"})
         
-        # Delete from DynamoDB
-        table.delete_item(
-            Key={
-                'userId': user_email,
-                'eventId': event_id
+        key = {
+            'userId': user_email,
+            'eventId': event_id
+        }
+        
+        # Delete the event and its reminder rows together
+        existing = table.get_item(Key=key).get('Item')
+        if existing:
+            condition, expr_names, expr_values = version_condition(existing)
+            delete = {
+                'TableName': EVENTS_TABLE,
+                'Key': to_wire(key),
+                'ConditionExpression': condition,
+                'ExpressionAttributeNames': expr_names
             }
-        )
+            if expr_values:
+                delete['ExpressionAttributeValues'] = to_wire(expr_values)
+            try:
+                dynamodb_client.transact_write_items(
+                    TransactItems=[{'Delete': delete}] + reminder_writes(existing, None)
+                )
+            except ClientError as e:
+                if is_conflict(e):
+                    return response(409, {"error": "Event was modified concurrently, please retry"})
+                raise
         
-        print(f"Deleted event {event_id} for user {user_email}")
+        logger.info("Deleted event", userId=user_email, eventId=event_id)
         
         return response(200, {
             "message": "Event deleted successfully",
@@ -266,11 +568,5 @@ def handle_delete_event(user_email, event):
         })
     
     except Exception as e:
-        print(f"Error deleting event: {str(e)}")
-        return response(500, {"error": f"Failed to delete event: {str(e)}"})
-
-def decimal_default(obj):
-    """Helper to convert Decimal to float for JSON"""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
\ No newline at end of file
+        logger.error("Failed to delete event", userId=user_email, error=str(e))
+        return response(500, {"error": f"Failed to delete event: {str(e)}"})
\ No newline at end of file
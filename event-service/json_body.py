@@ -0,0 +1,37 @@
+"""
+JSON encoding for event-service responses.
+
+Items read through the boto3 resource API hold numbers as Decimal and
+string/number sets as Python sets, which json can't write by itself.
+`dumps` converts them while it writes the body, so a payload is walked
+once: whole numbers (timestamps such as createdAt, reminder offsets) stay
+ints, other numbers become floats, and sets become lists.
+"""
+
+import base64
+import json
+from decimal import Decimal
+from boto3.dynamodb.types import Binary
+
+
+def to_json_value(obj):
+    """JSON-compatible value for a DynamoDB type json doesn't know"""
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            return int(obj)
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Binary):
+        return base64.b64encode(obj.value).decode()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# One encoder for the container: encode() goes through the C encoder and
+# only calls back into Python for the values above
+_encoder = json.JSONEncoder(default=to_json_value)
+
+
+def dumps(body):
+    """Response body JSON for plain and DynamoDB-typed values, in one pass"""
+    return _encoder.encode(body)
@@ -0,0 +1,201 @@
+"""
+Reminder schedule helpers.
+
+Every reminder an event needs has one row in the reminder schedule table,
+keyed by the UTC minute it goes out (plus a shard) so the per-minute
+notification run only reads the rows that are due:
+
+    bucket      = "<send minute UTC>#<shard>"   e.g. "2025-01-14T02:45#2"
+    reminderId  = "<userId>#<eventId>#<slot>"
+
+Events without reminder offsets get one "day" reminder at
+REMINDER_LOCAL_HOUR in the user's own timezone on the day before the event.
+Events with `reminderOffsets` (minutes before the start time) get one
+"m<offset>" row per offset instead, e.g. "m60" for an hour before. Rows
+carry a copy of the fields the reminder email shows, and are written in the
+same transaction as the event itself (see events.py).
+"""
+
+import os
+import zlib
+from datetime import datetime, timedelta
+from dateutil import tz
+
+REMINDER_SCHEDULE_TABLE = os.environ.get("REMINDER_SCHEDULE_TABLE", "ReminderScheduleTable")
+REMINDER_SHARDS = int(os.environ.get("REMINDER_SHARDS", "4"))
+REMINDER_LOCAL_HOUR = int(os.environ.get("REMINDER_LOCAL_HOUR", "8"))
+
+# Rows are dropped by DynamoDB TTL a few days after they were due
+REMINDER_TTL_DAYS = 3
+
+# Event fields copied onto the schedule row for the reminder email
+REMINDER_FIELDS = ('title', 'date', 'time', 'venue', 'details')
+
+# Limits on per-event reminder offsets (minutes before the event starts)
+MAX_REMINDER_OFFSETS = 5
+MAX_REMINDER_OFFSET_MINUTES = 7 * 24 * 60
+
+DAY_BEFORE_SLOT = "day"
+
+
+def reminder_shard(user_id):
+    """Stable shard for a user, so all their reminders share a partition"""
+    return zlib.crc32(user_id.encode("utf-8")) % REMINDER_SHARDS
+
+
+def parse_reminder_offsets(value):
+    """
+    Validate a `reminderOffsets` request field.
+
+    Returns the offsets as a sorted list of unique minute counts, largest
+    first. Raises ValueError if the value is not a short list of positive
+    whole minutes.
+    """
+    if value is None:
+        return []
+    if not isinstance(value, list) or len(value) > MAX_REMINDER_OFFSETS:
+        raise ValueError(f"reminderOffsets must be a list of at most {MAX_REMINDER_OFFSETS} values")
+    offsets = set()
+    for offset in value:
+        if isinstance(offset, bool) or not isinstance(offset, int) \
+                or not 0 < offset <= MAX_REMINDER_OFFSET_MINUTES:
+            raise ValueError(f"reminderOffsets must be whole minutes between 1 and {MAX_REMINDER_OFFSET_MINUTES}")
+        offsets.add(offset)
+    return sorted(offsets, reverse=True)
+
+
+def fetch_user_timezone(users_table, user_id):
+    """User's IANA timezone name from their UsersTable profile (None if not set)"""
+    user = users_table.get_item(
+        Key={"email": user_id},
+        ProjectionExpression='#tz',
+        ExpressionAttributeNames={'#tz': 'timezone'}
+    ).get('Item', {})
+    return user.get('timezone')
+
+
+def timezone_lookup(users_table):
+    """fetch_user_timezone for bulk work, reading each user's profile once"""
+    timezones = {}
+    def user_timezone(user_id):
+        if user_id not in timezones:
+            timezones[user_id] = fetch_user_timezone(users_table, user_id)
+        return timezones[user_id]
+    return user_timezone
+
+
+def user_zone(timezone_name):
+    """tzinfo for a timezone name; unknown or missing names fall back to UTC"""
+    return (tz.gettz(timezone_name) if timezone_name else None) or tz.UTC
+
+
+def reminder_send_time(event_date, timezone_name=None):
+    """
+    UTC time the day-before reminder for an event on `event_date`
+    (YYYY-MM-DD) is sent: REMINDER_LOCAL_HOUR on the day before, in the
+    user's timezone.
+    """
+    try:
+        day = datetime.strptime(event_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+    local = (day - timedelta(days=1)).replace(hour=REMINDER_LOCAL_HOUR, tzinfo=user_zone(timezone_name))
+    return local.astimezone(tz.UTC)
+
+
+def event_start_time(event_date, event_time, timezone_name=None):
+    """
+    UTC start of an event from its date and "HH:MM" time in the user's
+    timezone. None when either is missing or free text.
+    """
+    try:
+        start = datetime.strptime(f"{event_date} {event_time}", "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return None
+    return start.replace(tzinfo=user_zone(timezone_name)).astimezone(tz.UTC)
+
+
+def reminder_slots(item, timezone_name=None):
+    """
+    Reminders an event item needs, as (slot, UTC send time, offset minutes)
+    tuples. Offset reminders need a start time; without one the event falls
+    back to the day-before reminder.
+    """
+    offsets = [int(offset) for offset in item.get('reminderOffsets') or []]
+    start = event_start_time(item.get('date'), item.get('time'), timezone_name) if offsets else None
+    if start:
+        return [(f"m{offset}", start - timedelta(minutes=offset), offset) for offset in offsets]
+
+    send_time = reminder_send_time(item.get('date'), timezone_name)
+    return [(DAY_BEFORE_SLOT, send_time, None)] if send_time else []
+
+
+def slot_key(item, slot, send_time):
+    """Primary key of the schedule row for one reminder slot of an event"""
+    # Round up to the minute so nobody is reminded early
+    if send_time.second or send_time.microsecond:
+        send_time = send_time.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    return {
+        'bucket': f"{send_time.strftime('%Y-%m-%dT%H:%M')}#{reminder_shard(item['userId'])}",
+        'reminderId': f"{item['userId']}#{item['eventId']}#{slot}"
+    }
+
+
+def reminder_keys(item, timezone_name=None):
+    """Primary keys of every schedule row an event item can have"""
+    return [slot_key(item, slot, send_time) for slot, send_time, _ in reminder_slots(item, timezone_name)]
+
+
+def build_reminder_items(item, timezone_name=None, now=None):
+    """
+    Build the schedule rows for an event item.
+
+    Reminders whose send minute has already passed are left out, so an
+    event happening soon may get only some of its rows, or none.
+    """
+    now = (now or datetime.now(tz.UTC)).replace(second=0, microsecond=0)
+    reminders = []
+    for slot, send_time, offset in reminder_slots(item, timezone_name):
+        if send_time < now:
+            continue
+        reminder = slot_key(item, slot, send_time)
+        reminder['userId'] = item['userId']
+        reminder['eventId'] = item['eventId']
+        for field in REMINDER_FIELDS:
+            if field in item:
+                reminder[field] = item[field]
+        if offset is not None:
+            reminder['offsetMinutes'] = offset
+        reminder['expiresAt'] = int((send_time + timedelta(days=REMINDER_TTL_DAYS)).timestamp())
+        reminders.append(reminder)
+    return reminders
+
+
+def backfill(events_table_name, schedule_table_name=REMINDER_SCHEDULE_TABLE):
+    """Write schedule rows for every upcoming event already in the events table"""
+    import boto3
+
+    dynamodb = boto3.resource('dynamodb')
+    events_table = dynamodb.Table(events_table_name)
+    schedule_table = dynamodb.Table(schedule_table_name)
+    user_timezone = timezone_lookup(dynamodb.Table(os.environ.get("USERS_TABLE", "UsersTable")))
+
+    written = 0
+    scan_kwargs = {}
+    with schedule_table.batch_writer(overwrite_by_pkeys=['bucket', 'reminderId']) as batch:
+        while True:
+            response = events_table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                for reminder in build_reminder_items(item, user_timezone(item['userId'])):
+                    batch.put_item(Item=reminder)
+                    written += 1
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    print(f"Backfilled {written} reminders into {schedule_table_name}")
+
+
+if __name__ == "__main__":
+    backfill(os.environ.get("EVENTS_TABLE", "EventsTable"))
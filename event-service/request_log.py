@@ -0,0 +1,97 @@
+"""
+Structured logging for the events Lambda.
+
+Each log call writes one JSON line to stdout, which Lambda sends to
+CloudWatch Logs, where the fields can be queried in Logs Insights:
+
+    {"level": "INFO", "message": "Created event", "timestamp": ...,
+     "requestId": "...", "eventId": "...", "userId": "..."}
+
+Calls below LOG_LEVEL are bound to a no-op when the level is set, so a
+disabled call costs one function call and never builds its line. Fields
+whose names look like credentials (Authorization headers, tokens,
+passwords) are replaced with "[REDACTED]" wherever they appear. Full API
+Gateway events are only dumped for a REQUEST_LOG_SAMPLE_RATE fraction of
+requests; the rest get a one-line summary.
+"""
+
+import os
+import random
+import time
+from json_body import dumps
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+REDACTED = "[REDACTED]"
+
+# Lower-cased field names whose values never reach the logs
+SENSITIVE_FIELDS = frozenset({
+    "authorization", "cookie", "set-cookie", "x-api-key",
+    "password", "token", "secret"
+})
+
+
+def redact(value):
+    """Copy of value with sensitive fields replaced, at any depth"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(key, str) and key.lower() in SENSITIVE_FIELDS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+def _disabled(message, **fields):
+    pass
+
+
+class RequestLogger:
+    """
+    Leveled JSON logger with per-request context.
+
+    Args:
+        level: Minimum level name to write (DEBUG, INFO, WARNING, ERROR)
+        sample_rate: Fraction of requests whose full event log_request dumps
+        sink: Callable taking each JSON line; prints to stdout by default
+    """
+
+    def __init__(self, level="INFO", sample_rate=0.0, sink=None):
+        self.sample_rate = sample_rate
+        self.sink = sink or print
+        self.context = {}
+        self.set_level(level)
+
+    def set_level(self, level):
+        """Rebind debug/info/warning/error so calls below `level` do nothing"""
+        self.level = LEVELS.get(str(level).upper(), LEVELS["INFO"])
+        for name, number in LEVELS.items():
+            method = self._writer(name) if number >= self.level else _disabled
+            setattr(self, name.lower(), method)
+
+    def _writer(self, level):
+        def write(message, **fields):
+            line = {"level": level, "message": message, "timestamp": int(time.time() * 1000)}
+            line.update(self.context)
+            line.update(redact(fields))
+            self.sink(dumps(line))
+        return write
+
+    def start_request(self, event, context=None):
+        """
+        Reset the per-request context and log the incoming request: the full
+        (redacted) event for a sampled fraction of requests, a summary at
+        DEBUG otherwise.
+        """
+        self.context = {"requestId": getattr(context, "aws_request_id", None)}
+        fields = {"method": event.get("httpMethod"), "path": event.get("path")}
+        if self.sample_rate and random.random() < self.sample_rate:
+            self.info("Received event", event=event, **fields)
+        else:
+            self.debug("Received event", **fields)
+
+
+logger = RequestLogger(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    sample_rate=float(os.environ.get("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+)
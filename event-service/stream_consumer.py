@@ -0,0 +1,284 @@
+"""
+DynamoDB stream consumer for EventsTable.
+
+Keeps data derived from events up to date one change at a time, so it
+never has to be recomputed from a scan:
+
+  * reminder schedule rows, re-applied from each change. The API writes
+    them in the same transaction as the event; this repairs rows for
+    events written any other way (scripts, restores, the console).
+  * event counters in EventStatsTable:
+
+        userId     statKey           eventCount
+        <user>     count#total       events the user has
+        <user>     count#2025-01     the user's events in January 2025
+
+Stream batches can be delivered more than once, and counters are not
+idempotent on their own. Every counter update is written in a transaction
+with a per-event marker (statKey "seq#<eventId>") holding the last stream
+sequence number applied for that event, so a replayed change fails the
+marker's condition instead of counting twice.
+
+Stream shards are processed concurrently, so transactions on different
+shards can occasionally touch the same counter; a transaction cancelled by
+such a conflict is retried with backoff rather than failing the batch.
+"""
+
+import os
+import random
+import time
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from reminders import REMINDER_SCHEDULE_TABLE, build_reminder_items, reminder_keys, timezone_lookup
+from transactions import is_conflict, is_transient
+
+EVENT_STATS_TABLE = os.environ.get("EVENT_STATS_TABLE", "EventStatsTable")
+USERS_TABLE = os.environ.get("USERS_TABLE", "UsersTable")
+
+TOTAL_STAT = "count#total"
+
+# TransactWriteItems accepts at most 100 actions
+MAX_TRANSACTION_ITEMS = 100
+# Markers only need to outlive the stream's 24 hour retention
+MARKER_TTL_SECONDS = 2 * 24 * 60 * 60
+# Transactions cancelled by a concurrent one (or throttling) are retried
+TRANSACT_MAX_RETRIES = 8
+TRANSACT_BASE_DELAY = 0.05  # seconds, doubled on every retry
+
+dynamodb = boto3.resource('dynamodb')
+dynamodb_client = dynamodb.meta.client
+schedule_table = dynamodb.Table(REMINDER_SCHEDULE_TABLE)
+users_table = dynamodb.Table(USERS_TABLE)
+
+deserializer = TypeDeserializer()
+serializer = TypeSerializer()
+
+
+def from_wire(image):
+    """Convert a stream image from DynamoDB wire format to a plain item"""
+    return {key: deserializer.deserialize(value) for key, value in (image or {}).items()}
+
+
+def stat_keys(item):
+    """(userId, statKey) counters an event item counts towards"""
+    if not item:
+        return []
+    keys = [(item['userId'], TOTAL_STAT)]
+    month = str(item.get('date', ''))[:7]
+    if len(month) == 7 and month[4] == '-':
+        keys.append((item['userId'], f"count#{month}"))
+    return keys
+
+
+def count_deltas(old_item, new_item):
+    """Counter changes for one event going from old_item to new_item"""
+    deltas = {}
+    for key in stat_keys(old_item):
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in stat_keys(new_item):
+        deltas[key] = deltas.get(key, 0) + 1
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def parse_record(record):
+    """Return (old_item, new_item, sequence_number) for a stream record"""
+    change = record['dynamodb']
+    return from_wire(change.get('OldImage')), from_wire(change.get('NewImage')), change['SequenceNumber']
+
+
+def lambda_handler(event, context):
+    """
+    Triggered by the EventsTable stream with a batch of changes.
+
+    Any error fails the whole batch; Lambda retries it, and everything
+    applied here is safe to apply again.
+    """
+    records = event.get('Records', [])
+    report_iterator_age(records)
+
+    changes = [parse_record(record) for record in records]
+    scheduled = apply_schedule(changes)
+    counted, replayed = apply_counts(changes)
+
+    print(f"Processed {len(records)} changes: {scheduled} schedule writes, "
+          f"{counted} counter changes applied, {replayed} already applied")
+    return {"processed": len(records)}
+
+
+def report_iterator_age(records):
+    """
+    Log how far behind the stream this batch is (oldest record first).
+    Lambda also publishes this as the IteratorAge metric.
+    """
+    created = [
+        record['dynamodb']['ApproximateCreationDateTime']
+        for record in records if 'ApproximateCreationDateTime' in record.get('dynamodb', {})
+    ]
+    if not created:
+        return None
+    age = max(0.0, time.time() - float(min(created)))
+    print(f"Stream batch of {len(records)} records, iterator age {age:.1f}s")
+    return age
+
+
+def apply_schedule(changes):
+    """Re-apply the reminder schedule rows for every changed event"""
+    user_timezone = timezone_lookup(users_table)
+
+    writes = 0
+    # Later changes to the same row replace earlier ones in the batch
+    with schedule_table.batch_writer(overwrite_by_pkeys=['bucket', 'reminderId']) as batch:
+        for old_item, new_item, _ in changes:
+            timezone_name = user_timezone((new_item or old_item)['userId'])
+            new_reminders = build_reminder_items(new_item, timezone_name) if new_item else []
+            new_keys = [{'bucket': r['bucket'], 'reminderId': r['reminderId']} for r in new_reminders]
+            for old_key in reminder_keys(old_item, timezone_name) if old_item else []:
+                if old_key not in new_keys:
+                    batch.delete_item(Key=old_key)
+                    writes += 1
+            for reminder in new_reminders:
+                batch.put_item(Item=reminder)
+                writes += 1
+    return writes
+
+
+def counter_updates(deltas, markers):
+    """
+    Transaction actions adding deltas to counters and advancing markers.
+
+    Args:
+        deltas: Dict of (userId, statKey) -> change in eventCount
+        markers: Dict of (userId, eventId) -> (first, last) sequence
+            numbers of that event's changes being applied
+    """
+    actions = []
+    for (user_id, stat_key), delta in deltas.items():
+        if not delta:
+            continue
+        actions.append({'Update': {
+            'TableName': EVENT_STATS_TABLE,
+            'Key': {'userId': {'S': user_id}, 'statKey': {'S': stat_key}},
+            'UpdateExpression': 'ADD eventCount :delta',
+            'ExpressionAttributeValues': {':delta': serializer.serialize(delta)}
+        }})
+    expires_at = int(time.time()) + MARKER_TTL_SECONDS
+    for (user_id, event_id), (first, last) in markers.items():
+        actions.append({'Update': {
+            'TableName': EVENT_STATS_TABLE,
+            'Key': {'userId': {'S': user_id}, 'statKey': {'S': f"seq#{event_id}"}},
+            'UpdateExpression': 'SET lastSequence = :last, expiresAt = :expires',
+            'ConditionExpression': 'attribute_not_exists(lastSequence) OR lastSequence < :first',
+            'ExpressionAttributeValues': {
+                ':first': {'N': first},
+                ':last': {'N': last},
+                ':expires': {'N': str(expires_at)}
+            }
+        }})
+    return actions
+
+
+def apply_counts(changes):
+    """
+    Apply counter changes, summed per counter across as many changes as fit
+    in one transaction.
+
+    Returns:
+        Tuple of (changes_applied, changes_already_applied)
+    """
+    applied = replayed = 0
+    for chunk in counter_chunks(changes):
+        deltas, markers = {}, {}
+        for item, sequence, change_deltas in chunk:
+            for key, delta in change_deltas.items():
+                deltas[key] = deltas.get(key, 0) + delta
+            marker = (item['userId'], item['eventId'])
+            markers[marker] = (markers.get(marker, (sequence,))[0], sequence)
+
+        try:
+            transact(counter_updates(deltas, markers))
+            applied += len(chunk)
+        except ClientError as e:
+            if not is_conflict(e):
+                raise
+            # Part of this chunk was applied before; go one change at a time
+            for item, sequence, change_deltas in chunk:
+                marker = {(item['userId'], item['eventId']): (sequence, sequence)}
+                try:
+                    transact(counter_updates(change_deltas, marker))
+                    applied += 1
+                except ClientError as e:
+                    # A marker's sequence check failed: already applied
+                    if not is_conflict(e):
+                        raise
+                    replayed += 1
+    return applied, replayed
+
+
+def counter_chunks(changes):
+    """
+    Group changes that move counters into chunks whose counters and markers
+    fit in one transaction. Changes keep their stream order.
+    """
+    chunk, keys = [], set()
+    for old_item, new_item, sequence in changes:
+        change_deltas = count_deltas(old_item, new_item)
+        if not change_deltas:
+            continue
+        item = new_item or old_item
+        change_keys = set(change_deltas) | {('seq', item['userId'], item['eventId'])}
+        if chunk and len(keys | change_keys) > MAX_TRANSACTION_ITEMS:
+            yield chunk
+            chunk, keys = [], set()
+        chunk.append((item, sequence, change_deltas))
+        keys |= change_keys
+    if chunk:
+        yield chunk
+
+
+def transact(actions):
+    """
+    TransactWriteItems, retried with jittered backoff while it is cancelled
+    by another transaction on the same counters. Other errors, including a
+    marker's failed condition, are raised.
+    """
+    for attempt in range(TRANSACT_MAX_RETRIES + 1):
+        try:
+            return dynamodb_client.transact_write_items(TransactItems=actions)
+        except ClientError as e:
+            if is_conflict(e) or not is_transient(e) or attempt == TRANSACT_MAX_RETRIES:
+                raise
+        delay = TRANSACT_BASE_DELAY * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay))
+
+
+def rebuild_counts(events_table_name):
+    """
+    Recompute every counter from a full scan of the events table.
+
+    One-off, for events written before the consumer existed; run it while
+    nothing is writing events, since it overwrites the counters outright.
+    """
+    events_table = dynamodb.Table(events_table_name)
+    stats_table = dynamodb.Table(EVENT_STATS_TABLE)
+
+    counts = {}
+    scan_kwargs = {}
+    while True:
+        response = events_table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            for key in stat_keys(item):
+                counts[key] = counts.get(key, 0) + 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with stats_table.batch_writer() as batch:
+        for (user_id, stat_key), count in counts.items():
+            batch.put_item(Item={'userId': user_id, 'statKey': stat_key, 'eventCount': count})
+
+    print(f"Rebuilt {len(counts)} counters in {EVENT_STATS_TABLE}")
+
+
+if __name__ == "__main__":
+    rebuild_counts(os.environ.get("EVENTS_TABLE", "EventsTable"))
@@ -0,0 +1,64 @@
+"""
+Verified-token cache for the events Lambda.
+
+The dashboard sends the same bearer token on every request until it
+expires, and a warm container serves many of them. TokenCache remembers
+the email each verified token decoded to, keyed by the token's SHA-256 (the
+token itself is never stored), until the token's `exp`. Expiry is checked
+on every hit, so a cached token stops working at the same moment jwt.decode
+would reject it. Only tokens with an `exp` claim are cached, and the least
+recently used entry is dropped once `max_size` is reached.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """
+    Bounded LRU of token hash -> (email, exp).
+
+    Args:
+        max_size: Most tokens kept; 0 disables the cache
+        clock: Callable returning the current Unix time (time.time by default)
+    """
+
+    def __init__(self, max_size=1024, clock=None):
+        self.max_size = max_size
+        self.clock = clock or time.time
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        """Email for a cached, unexpired token, or None (counted as a miss)"""
+        key = self.key(token)
+        entry = self.entries.get(key)
+        if entry is not None:
+            email, expires_at = entry
+            if self.clock() < expires_at:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return email
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, token, email, expires_at):
+        """Remember a verified token's email until expires_at (skipped without one)"""
+        if not self.max_size or not email or expires_at is None:
+            return
+        key = self.key(token)
+        self.entries[key] = (email, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """Hit/miss counters since the container started"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
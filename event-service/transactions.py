@@ -0,0 +1,26 @@
+"""
+Telling apart why a DynamoDB transaction was cancelled.
+
+TransactWriteItems fails with one TransactionCanceledException whatever
+went wrong; the per-action CancellationReasons say whether a condition
+failed (someone else changed the item first, or a change was already
+applied) or the transaction only collided with another one and can be
+retried.
+"""
+
+
+def cancellation_codes(error):
+    """Codes of the reasons a TransactionCanceledException gives, else none"""
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return set()
+    return {reason.get('Code') for reason in error.response.get('CancellationReasons', [])}
+
+
+def is_conflict(error):
+    """True if a transaction was cancelled because a condition check failed"""
+    return 'ConditionalCheckFailed' in cancellation_codes(error)
+
+
+def is_transient(error):
+    """True if a transaction was cancelled by a concurrent transaction or throttling"""
+    return bool(cancellation_codes(error) & {'TransactionConflict', 'ThrottlingError'})
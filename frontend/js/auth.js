@@ -90,7 +90,9 @@ document.addEventListener("DOMContentLoaded", () => {
           full_name,
           email,
           password,
-          confirm_password: confirm
+          confirm_password: confirm,
+          // Browser's IANA timezone, so reminders arrive in the user's morning
+          timezone: Intl.DateTimeFormat().resolvedOptions().timeZone
         });
 
         alert("Signup successful! Please login.");
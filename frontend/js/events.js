@@ -2,6 +2,14 @@
 
 let EVENTS_API_BASE = null;
 let currentEditingEvent = null; // Track which event is being edited
+let loadedEvents = [];           // Events from the pages loaded so far
+let nextEventsCursor = null;     // Cursor for the next page (null after the last)
+let recentWrites = new Map();    // eventId -> { event, deleted, at } for writes the list may not show yet
+
+const EVENTS_PAGE_SIZE = 50;
+// The date-ordered listing reads an eventually consistent index, which can
+// lag a write for a moment; writes are applied on top of it for this long
+const RECENT_WRITE_MS = 30000;
 
 // ---------------------------
 // Load events API base from config.json
@@ -42,7 +50,7 @@ function getAuthHeader() {
 // ---------------------------
 // Generic API call to /events
 // ---------------------------
-async function apiRequestEvents(method, body = null) {
+async function apiRequestEvents(method, body = null, params = null) {
     await loadEventsConfig();
 
     const opts = {
@@ -57,7 +65,8 @@ async function apiRequestEvents(method, body = null) {
         opts.body = JSON.stringify(body);
     }
 
-    const res = await fetch(EVENTS_API_BASE, opts);
+    const query = params ? "?" + new URLSearchParams(params).toString() : "";
+    const res = await fetch(EVENTS_API_BASE + query, opts);
     const text = await res.text();
 
     if (!res.ok) {
@@ -103,8 +112,7 @@ function renderEvents(items) {
         emptyState.style.display = "none";
     }
 
-    // Sort events by date (most recent first)
-    items.sort((a, b) => new Date(b.date) - new Date(a.date));
+    // Items arrive sorted by date (most recent first) from the API
 
     items.forEach(ev => {
         const card = document.createElement("div");
@@ -140,15 +148,63 @@ function renderEvents(items) {
     });
 }
 
+// ======================================================
+// READ-YOUR-WRITES
+// ======================================================
+function rememberWrite(eventId, event, deleted = false) {
+    recentWrites.set(eventId, { event, deleted, at: Date.now() });
+}
+
+// Apply this tab's recent creates, updates and deletes to a listing the
+// index may not have caught up with yet, keeping it sorted newest first
+function withRecentWrites(items) {
+    const now = Date.now();
+    for (const [eventId, write] of recentWrites) {
+        if (now - write.at > RECENT_WRITE_MS) {
+            recentWrites.delete(eventId);
+        }
+    }
+
+    let merged = items.filter(ev => !(recentWrites.get(ev.eventId) || {}).deleted);
+    for (const [eventId, write] of recentWrites) {
+        if (write.deleted) continue;
+        const listed = merged.find(ev => ev.eventId === eventId);
+        // An older copy from the index is replaced; a newer one is kept
+        if (listed && Number(listed.version || 0) >= Number(write.event.version || 0)) continue;
+        merged = merged.filter(ev => ev.eventId !== eventId);
+        // Only within the dates loaded so far; later pages bring the rest
+        const oldest = merged.length ? merged[merged.length - 1].date : null;
+        if (!nextEventsCursor || oldest === null || write.event.date >= oldest) {
+            merged.push(write.event);
+        }
+    }
+    return merged.sort((a, b) => (a.date < b.date ? 1 : a.date > b.date ? -1 : 0));
+}
+
 // ======================================================
 // LOAD EVENTS
 // ======================================================
-async function loadEventsList() {
+// Events come a page at a time; "Load more" fetches the next page
+async function loadEventsList(append = false) {
     await loadEventsConfig();
     try {
-        const res = await apiRequestEvents("GET");
+        // Newest dates first, sorted by DynamoDB across all pages
+        const params = { limit: EVENTS_PAGE_SIZE, order: "desc" };
+        if (append && nextEventsCursor) {
+            params.cursor = nextEventsCursor;
+        }
+
+        const res = await apiRequestEvents("GET", null, params);
         console.log("Fetched events:", res.items);
-        renderEvents(res.items);
+
+        nextEventsCursor = res.nextCursor || null;
+        loadedEvents = withRecentWrites(append ? loadedEvents.concat(res.items) : res.items);
+        renderEvents(loadedEvents);
+
+        const loadMoreBtn = document.getElementById("loadMoreBtn");
+        if (loadMoreBtn) {
+            loadMoreBtn.style.display = nextEventsCursor ? "block" : "none";
+        }
     } catch (e) {
         console.error("Failed to load events:", e);
         showAlert("Failed to load events: " + e.message, "error");
@@ -160,9 +216,8 @@ async function loadEventsList() {
 // ======================================================
 async function editEvent(eventId) {
     try {
-        // Get all events and find the one to edit
-        const res = await apiRequestEvents("GET");
-        const event = res.items.find(e => e.eventId === eventId);
+        // Edit buttons are only shown for events already loaded
+        const event = loadedEvents.find(e => e.eventId === eventId);
         
         if (!event) {
             showAlert("Event not found", "error");
@@ -178,6 +233,10 @@ async function editEvent(eventId) {
         document.getElementById("eventTime").value = event.time !== "Not specified" ? event.time : "";
         document.getElementById("eventVenue").value = event.venue !== "Not specified" ? event.venue : "";
         document.getElementById("eventDetails").value = event.details;
+        const offsets = (event.reminderOffsets || []).map(Number);
+        document.querySelectorAll('input[name="reminderOffset"]').forEach(box => {
+            box.checked = offsets.includes(Number(box.value));
+        });
 
         // Change button text to "Update Event"
         const submitBtn = document.getElementById("saveEventBtn");
@@ -213,6 +272,7 @@ async function deleteEvent(eventId, eventTitle) {
         
         // Send eventId in request body
         await apiRequestEvents("DELETE", { eventId: eventId });
+        rememberWrite(eventId, null, true);
         
         showAlert("Event deleted successfully! 🗑️", "success");
         
@@ -297,6 +357,11 @@ document.addEventListener("DOMContentLoaded", () => {
         loadEventsList();  // refresh when switching back
     });
 
+    // Next page of events
+    document.getElementById("loadMoreBtn")?.addEventListener("click", () => {
+        loadEventsList(true);
+    });
+
     // Cancel button
     cancelBtn?.addEventListener("click", () => {
         viewEventsBtn.click(); // Trigger view events
@@ -311,7 +376,10 @@ document.addEventListener("DOMContentLoaded", () => {
             date: document.getElementById("eventDate").value,
             time: document.getElementById("eventTime").value,
             venue: document.getElementById("eventVenue").value,
-            details: document.getElementById("eventDetails").value
+            details: document.getElementById("eventDetails").value,
+            reminderOffsets: Array.from(
+                document.querySelectorAll('input[name="reminderOffset"]:checked')
+            ).map(box => Number(box.value))
         };
 
         try {
@@ -319,12 +387,14 @@ document.addEventListener("DOMContentLoaded", () => {
                 // UPDATE existing event
                 payload.eventId = currentEditingEvent.eventId;
                 
-                await apiRequestEvents("PUT", payload);
+                const res = await apiRequestEvents("PUT", payload);
+                rememberWrite(res.event.eventId, res.event);
                 showAlert("Event updated successfully! ✏️", "success");
                 
             } else {
                 // CREATE new event
-                await apiRequestEvents("POST", payload);
+                const res = await apiRequestEvents("POST", payload);
+                rememberWrite(res.event.eventId, res.event);
                 showAlert("Event created successfully! 🎉", "success");
             }
 
@@ -0,0 +1,161 @@
+"""
+"Your next 7 days" digests.
+
+A digest run reads every day of its window in one pass, with each user's
+events for the whole window arriving together (see
+notification.iter_events_for_days), and sends every user whose digest is
+due one message listing their events day by day.
+
+How often a user gets a digest and how far ahead it looks come from
+optional attributes of their UsersTable item:
+
+    digestCadence   "weekly" (default), "daily" or "off"
+    digestWeekday   day weekly digests go out, 0 = Monday (default: the
+                    run's default weekday)
+    digestDays      days ahead the digest covers, 1 up to the run's window
+                    (default: the whole window)
+"""
+
+from datetime import datetime, timedelta
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def _as_int(value, default):
+    """Profile numbers come back as Decimals (or strings if set by hand)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class DigestPlan:
+    """
+    The digests one run sends.
+
+    Args:
+        first_day: First date digests cover (YYYY-MM-DD), the day after the run
+        days: Days read from first_day on; no digest covers more
+        default_weekday: Weekday weekly digests go out on for users who
+            haven't picked one (0 = Monday)
+    """
+
+    def __init__(self, first_day, days, default_weekday=0):
+        self.first_day = first_day
+        self.days = days
+        self.default_weekday = default_weekday
+        self.start = datetime.strptime(first_day, "%Y-%m-%d")
+        self.run_date = self.start - timedelta(days=1)
+        # Ledger key: one digest per user per run
+        self.key = f"digest#{first_day}"
+
+    def dates(self, days=None):
+        """The dates of the first `days` days of the window (all by default)"""
+        return [(self.start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days or self.days)]
+
+    def as_dict(self):
+        return {"firstDay": self.first_day, "days": self.days, "defaultWeekday": self.default_weekday}
+
+    @classmethod
+    def from_dict(cls, plan):
+        return cls(plan["firstDay"], plan["days"], plan.get("defaultWeekday", 0))
+
+    def window(self, profile):
+        """Number of days the user's digest covers this run (0 if none is due)"""
+        profile = profile or {}
+        cadence = str(profile.get('digestCadence') or 'weekly').lower()
+        if cadence == 'off':
+            return 0
+        if cadence != 'daily':
+            weekday = _as_int(profile.get('digestWeekday'), self.default_weekday)
+            if weekday != self.run_date.weekday():
+                return 0
+        return max(1, min(_as_int(profile.get('digestDays'), self.days), self.days))
+
+    def events_by_day(self, events, days):
+        """List of (date, events sorted by time) for the first `days` days"""
+        dates = set(self.dates(days))
+        by_day = {}
+        for event in events:
+            if event.get('date') in dates:
+                by_day.setdefault(event.get('date'), []).append(event)
+        return [
+            (date, sorted(day_events, key=lambda event: event.get('time', '')))
+            for date, day_events in sorted(by_day.items())
+        ]
+
+    def render(self, user_id, events, profile=None):
+        """
+        Build the digest email for a user's events in the window.
+
+        Args:
+            user_id: Email of the user
+            events: The user's events over the window read by the run
+            profile: User item from fetch_user_profiles (None if not found)
+
+        Returns:
+            Dict with Subject, Message and MessageAttributes for SNS, or
+            None if no digest is due or nothing falls in the user's window
+        """
+        days = self.window(profile)
+        by_day = self.events_by_day(events, days) if days else []
+        if not by_day:
+            return None
+
+        full_name = (profile or {}).get('full_name', 'User')
+        event_count = sum(len(day_events) for _, day_events in by_day)
+        last_day = self.dates(days)[-1]
+
+        subject = f"🗓️ Your next {days} day(s): {event_count} event(s) coming up"
+
+        body_lines = [
+            f"Hi {full_name},",
+            "",
+            f"Here's what's coming up from {self.first_day} to {last_day}:",
+            "",
+            "=" * 60,
+            ""
+        ]
+
+        for date, day_events in by_day:
+            weekday = WEEKDAYS[datetime.strptime(date, "%Y-%m-%d").weekday()]
+            body_lines.append(f"{weekday}, {date}")
+            for event in day_events:
+                body_lines.append(f"  🕐 {event.get('time', 'Not specified')}  {event.get('title', 'Untitled')}")
+                body_lines.append(f"     📍 {event.get('venue', 'Not specified')}")
+            body_lines.append("")
+            body_lines.append("-" * 60)
+            body_lines.append("")
+
+        body_lines.extend([
+            "",
+            "Best regards,",
+            "Event Planner Team",
+            "",
+            "---",
+            "This is an automated digest from Event Planner.",
+            "You're receiving this because digests are turned on for your account."
+        ])
+
+        return {
+            'Subject': subject,
+            'Message': "\n".join(body_lines),
+            'MessageAttributes': {
+                'user_email': {
+                    'DataType': 'String',
+                    'StringValue': user_id
+                },
+                'event_date': {
+                    'DataType': 'String',
+                    'StringValue': self.first_day
+                },
+                'event_count': {
+                    'DataType': 'Number',
+                    'StringValue': str(event_count)
+                },
+                'digest_days': {
+                    'DataType': 'Number',
+                    'StringValue': str(days)
+                }
+            }
+        }
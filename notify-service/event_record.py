@@ -0,0 +1,102 @@
+"""
+Compact event records for bulk processing (notifications, exports, analytics).
+
+A boto3 resource item is a dict of str keys to str and Decimal values,
+several hundred bytes of overhead per event before the text itself.
+EventRecord keeps the same fields in __slots__, with numbers as ints and
+the strings repeated across many events (user, date, time) interned, and
+is built straight from the wire format of a low-level client response
+without going through TypeDeserializer.
+
+Records answer get()/[] with the item's attribute names, so code written
+against item dicts (render_notification, grouping) works on either.
+"""
+
+import sys
+from decimal import Decimal
+
+_MISSING = {}
+
+
+class EventRecord:
+    """Read-only view of the event fields used by bulk consumers"""
+
+    __slots__ = ('user_id', 'event_id', 'title', 'date', 'time', 'venue', 'details', 'offset_minutes')
+
+    # Item attribute name -> slot
+    FIELDS = {
+        'userId': 'user_id',
+        'eventId': 'event_id',
+        'title': 'title',
+        'date': 'date',
+        'time': 'time',
+        'venue': 'venue',
+        'details': 'details',
+        'offsetMinutes': 'offset_minutes',
+    }
+
+    def __init__(self, user_id=None, event_id=None, title=None, date=None, time=None,
+                 venue=None, details=None, offset_minutes=None):
+        self.user_id = user_id
+        self.event_id = event_id
+        self.title = title
+        self.date = date
+        self.time = time
+        self.venue = venue
+        self.details = details
+        self.offset_minutes = offset_minutes
+
+    @classmethod
+    def from_wire(cls, image):
+        """Build a record from a DynamoDB wire-format item ({'S': ...}, {'N': ...})"""
+        user_id = image.get('userId', _MISSING).get('S')
+        date = image.get('date', _MISSING).get('S')
+        time = image.get('time', _MISSING).get('S')
+        offset = image.get('offsetMinutes', _MISSING).get('N')
+        return cls(
+            sys.intern(user_id) if user_id else None,
+            image.get('eventId', _MISSING).get('S'),
+            image.get('title', _MISSING).get('S'),
+            sys.intern(date) if date else None,
+            sys.intern(time) if time else None,
+            image.get('venue', _MISSING).get('S'),
+            image.get('details', _MISSING).get('S'),
+            int(offset) if offset is not None else None
+        )
+
+    @classmethod
+    def from_item(cls, item):
+        """Build a record from a boto3 resource item (plain dict with Decimals)"""
+        offset = item.get('offsetMinutes')
+        return cls(
+            item.get('userId'),
+            item.get('eventId'),
+            item.get('title'),
+            item.get('date'),
+            item.get('time'),
+            item.get('venue'),
+            item.get('details'),
+            int(offset) if isinstance(offset, (int, Decimal)) else None
+        )
+
+    def get(self, key, default=None):
+        slot = self.FIELDS.get(key)
+        value = getattr(self, slot) if slot else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def to_item(self):
+        """Plain dict of the fields that are set, keyed by item attribute names"""
+        return {
+            key: getattr(self, slot)
+            for key, slot in self.FIELDS.items()
+            if getattr(self, slot) is not None
+        }
+
+    def __repr__(self):
+        return f"EventRecord({self.to_item()!r})"
@@ -0,0 +1,146 @@
+"""
+Ledger of reminders already sent, so retried or overlapping notification
+runs don't send the same reminder twice.
+
+Rows are keyed by "<userId>#<reminder key>", where the reminder key is the
+event date for daily runs, the schedule window (UTC minute) for scheduled
+reminders, or "digest#<first day>" for digests. A user can have a row per
+key in the same run, so every check is per (user, reminder key). Rows move
+through two states:
+
+    sending  claimed by a run with a conditional put, just before publishing
+    sent     written once SNS accepted the message
+
+A failed publish deletes the claim so the next retry can send it. Claims
+left in "sending" by a crashed run can be taken over once they are stale.
+Rows expire through DynamoDB TTL.
+"""
+
+import time
+from botocore.exceptions import ClientError
+
+# BatchGetItem / BatchWriteItem limits
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+RETRY_DELAY = 0.05  # seconds between retries of unprocessed keys
+
+LEDGER_TTL_SECONDS = 7 * 24 * 60 * 60
+# A "sending" claim older than this belongs to a run that died mid-publish
+STALE_CLAIM_SECONDS = 15 * 60
+
+
+class ReminderLedger:
+    """
+    Dedupe ledger backed by a DynamoDB table.
+
+    Uses the low-level client, which (unlike boto3 resources) is safe to
+    share between the publisher threads.
+    """
+
+    def __init__(self, client, table_name):
+        self.client = client
+        self.table_name = table_name
+
+    @staticmethod
+    def ledger_key(user_id, reminder_key):
+        return f"{user_id}#{reminder_key}"
+
+    def sent_reminders(self, reminders):
+        """
+        Return the (user_id, reminder_key) reminders that were already sent.
+
+        A user can have several reminders in one run (a day reminder and a
+        digest), so each is checked on its own.
+
+        Args:
+            reminders: List of (user_id, reminder_key) tuples
+        """
+        by_ledger_key = {
+            self.ledger_key(user_id, reminder_key): (user_id, reminder_key)
+            for user_id, reminder_key in reminders
+        }
+        ledger_keys = list(by_ledger_key)
+        sent = set()
+        for start in range(0, len(ledger_keys), BATCH_GET_SIZE):
+            request_items = {
+                self.table_name: {
+                    'Keys': [
+                        {'ledgerKey': {'S': ledger_key}}
+                        for ledger_key in ledger_keys[start:start + BATCH_GET_SIZE]
+                    ],
+                    'ProjectionExpression': 'ledgerKey, #st',
+                    'ExpressionAttributeNames': {'#st': 'status'},
+                    'ConsistentRead': True
+                }
+            }
+            # Unprocessed keys just get checked again; claim() is the real guard
+            while request_items:
+                response = self.client.batch_get_item(RequestItems=request_items)
+                for row in response.get('Responses', {}).get(self.table_name, []):
+                    if row['status']['S'] == 'sent':
+                        sent.add(by_ledger_key[row['ledgerKey']['S']])
+                request_items = response.get('UnprocessedKeys') or {}
+                if request_items:
+                    time.sleep(RETRY_DELAY)
+        return sent
+
+    def claim(self, user_id, reminder_key):
+        """
+        Claim the right to send user_id's reminder for reminder_key.
+
+        Returns False if the reminder was already sent, or another run is
+        sending it right now.
+        """
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'ledgerKey': {'S': self.ledger_key(user_id, reminder_key)},
+                    'userId': {'S': user_id},
+                    'status': {'S': 'sending'},
+                    'claimedAt': {'N': str(now)},
+                    'expiresAt': {'N': str(now + LEDGER_TTL_SECONDS)}
+                },
+                ConditionExpression='attribute_not_exists(ledgerKey) OR (#st = :sending AND claimedAt < :stale)',
+                ExpressionAttributeNames={'#st': 'status'},
+                ExpressionAttributeValues={
+                    ':sending': {'S': 'sending'},
+                    ':stale': {'N': str(now - STALE_CLAIM_SECONDS)}
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def mark_sent(self, reminders):
+        """Record that (user_id, reminder_key) reminders were delivered to SNS"""
+        now = int(time.time())
+        for start in range(0, len(reminders), BATCH_WRITE_SIZE):
+            request_items = {
+                self.table_name: [
+                    {'PutRequest': {'Item': {
+                        'ledgerKey': {'S': self.ledger_key(user_id, reminder_key)},
+                        'userId': {'S': user_id},
+                        'status': {'S': 'sent'},
+                        'sentAt': {'N': str(now)},
+                        'expiresAt': {'N': str(now + LEDGER_TTL_SECONDS)}
+                    }}}
+                    for user_id, reminder_key in reminders[start:start + BATCH_WRITE_SIZE]
+                ]
+            }
+            while request_items:
+                response = self.client.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems') or {}
+                if request_items:
+                    time.sleep(RETRY_DELAY)
+
+    def release(self, reminders):
+        """Drop claims for (user_id, reminder_key) reminders that failed to publish"""
+        for user_id, reminder_key in reminders:
+            self.client.delete_item(
+                TableName=self.table_name,
+                Key={'ledgerKey': {'S': self.ledger_key(user_id, reminder_key)}}
+            )
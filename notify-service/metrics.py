@@ -0,0 +1,164 @@
+"""
+Run metrics in CloudWatch Embedded Metric Format (EMF).
+
+Phases of a notification run add to timers, counters and latency
+histograms as they go; flush() writes them as one EMF JSON line. Lambda
+sends stdout to CloudWatch Logs, which turns the line into metrics without
+any PutMetricData calls, and the line stays queryable in Logs Insights:
+
+    {"_aws": {"Timestamp": ..., "CloudWatchMetrics": [{"Namespace": ...,
+      "Dimensions": [["Service", "RunType"]], "Metrics": [...]}]},
+     "Service": "notification", "RunType": "date",
+     "ReadTime": 812.4, "PublishLatency": {"Values": [...], "Counts": [...]}, ...}
+
+Latencies are kept as counts per bucket (about 10 buckets per power of
+ten), so percentiles can be graphed without storing every sample.
+"""
+
+import json
+import math
+import sys
+import threading
+import time
+
+MILLISECONDS = "Milliseconds"
+COUNT = "Count"
+
+# EMF accepts at most 100 values per metric and 100 metrics per line
+MAX_HISTOGRAM_VALUES = 100
+BUCKETS_PER_DECADE = 10
+
+
+def bucket(value):
+    """Round a positive value to its histogram bucket (~26% wide)"""
+    if value <= 0:
+        return 0.0
+    exponent = round(math.log10(value) * BUCKETS_PER_DECADE) / BUCKETS_PER_DECADE
+    return float(f"{10 ** exponent:.3g}")
+
+
+class RunMetrics:
+    """
+    Thread-safe metrics for one run, emitted as an EMF line on flush().
+
+    Args:
+        namespace: CloudWatch namespace the metrics go to
+        dimensions: Dict of dimension name -> value every metric carries
+        sink: Callable taking each EMF line; prints to stdout by default
+    """
+
+    def __init__(self, namespace, dimensions, sink=None):
+        self.namespace = namespace
+        self.dimensions = dict(dimensions)
+        self.sink = sink or print
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+            self.units = {}
+            self.histograms = {}
+            self.properties = {}
+
+    def add(self, name, value, unit=COUNT):
+        """Add to a counter or timer (timers are summed over the run)"""
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + value
+            self.units[name] = unit
+
+    def observe(self, name, value, unit=MILLISECONDS):
+        """Record one sample of a latency histogram"""
+        key = bucket(value)
+        with self.lock:
+            histogram = self.histograms.setdefault(name, {})
+            histogram[key] = histogram.get(key, 0) + 1
+            self.units[name] = unit
+
+    def value(self, name):
+        """Current value of a counter or timer (0 if nothing was added)"""
+        with self.lock:
+            return self.values.get(name, 0)
+
+    def timed(self, iterable, name):
+        """Yield from iterable, adding the time spent producing each item to timer `name`"""
+        items = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.add(name, (time.perf_counter() - started) * 1000, MILLISECONDS)
+            yield item
+
+    def timer(self, name, histogram=None):
+        """Context manager adding the time taken to timer `name` (and histogram)"""
+        return _Timer(self, name, histogram)
+
+    def set_property(self, name, value):
+        """Non-metric field on the line (searchable in Logs Insights)"""
+        with self.lock:
+            self.properties[name] = value
+
+    def set_dimension(self, name, value):
+        with self.lock:
+            self.dimensions[name] = value
+
+    def to_emf(self):
+        with self.lock:
+            line = dict(self.properties, **self.dimensions)
+            metrics = []
+            for name, value in self.values.items():
+                line[name] = round(value, 3) if isinstance(value, float) else value
+                metrics.append({"Name": name, "Unit": self.units[name]})
+            for name, histogram in self.histograms.items():
+                values = sorted(histogram)[-MAX_HISTOGRAM_VALUES:]
+                line[name] = {"Values": values, "Counts": [histogram[value] for value in values]}
+                metrics.append({"Name": name, "Unit": self.units[name]})
+        line["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": self.namespace,
+                "Dimensions": [sorted(self.dimensions)],
+                "Metrics": metrics
+            }]
+        }
+        return line
+
+    def flush(self):
+        """Emit everything recorded since the last flush as one EMF line"""
+        line = self.to_emf()
+        if line["_aws"]["CloudWatchMetrics"][0]["Metrics"]:
+            self.sink(json.dumps(line))
+        self.reset()
+
+
+class _Timer:
+    def __init__(self, metrics, name, histogram):
+        self.metrics = metrics
+        self.name = name
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.metrics.add(self.name, elapsed_ms, MILLISECONDS)
+        if self.histogram:
+            self.metrics.observe(self.histogram, elapsed_ms)
+        return False
+
+
+def file_sink(path):
+    """Sink appending EMF lines to a local file ("-" for stderr)"""
+    def write(line):
+        if path == "-":
+            print(line, file=sys.stderr)
+            return
+        with open(path, "a") as f:
+            f.write(line + "\n")
+    return write
@@ -1,120 +1,1012 @@
 import json
 import boto3
 import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
 from decimal import Decimal
+from heapq import merge
+from digest import DigestPlan
+from event_record import EventRecord
+from metrics import MILLISECONDS, RunMetrics, file_sink
+from checkpoint import DynamoCheckpointStore, RunProgress
+from ledger import ReminderLedger
+from parallel_scan import parallel_scan
+from rate_limiter import TokenBucket
+from run_budget import RunBudget
+from reminder_queue import SEND_BATCH_SIZE, JobTooLarge, SqsReminderQueue, decode_job, encode_job, job_batches
 
 # Environment variables
 EVENTS_TABLE = os.environ.get("EVENTS_TABLE", "EventsTable")
 SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
 USERS_TABLE = os.environ.get("USERS_TABLE", "UsersTable")
+# GSI on EventsTable keyed by date; leave empty to fall back to a full scan
+EVENTS_DATE_INDEX = os.environ.get("EVENTS_DATE_INDEX", "DateIndex")
+# Precomputed reminder rows written by the events service; leave empty to
+# read the date index instead
+REMINDER_SCHEDULE_TABLE = os.environ.get("REMINDER_SCHEDULE_TABLE", "")
+REMINDER_SHARDS = int(os.environ.get("REMINDER_SHARDS", "4"))
+# Parallel scan segments used by the full-scan fallback
+SCAN_SEGMENTS = int(os.environ.get("SCAN_SEGMENTS", "4"))
+
+# Counters a run's reads add to (a resumed run restores them, see query_pages)
+READ_STATS = ("total_events", "date_events", "consumed_read_units")
+
+# Only the attributes the reminder email needs ('date' and 'time' are reserved words)
+EVENT_PROJECTION = 'userId, title, #dt, #tm, venue, details'
+EVENT_PROJECTION_NAMES = {'#dt': 'date', '#tm': 'time'}
+# Schedule rows also say how long before the event they are due
+SCHEDULE_PROJECTION = EVENT_PROJECTION + ', offsetMinutes'
+
+# Profile attributes for the email greeting and digest settings
+PROFILE_PROJECTION = 'email, full_name, digestCadence, digestWeekday, digestDays'
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_DELAY = 0.05  # seconds, doubled on every retry
+
+# Concurrent SNS publishing; keep the rate at or below the account's Publish quota
+PUBLISH_WORKERS = int(os.environ.get("PUBLISH_WORKERS", "16"))
+SNS_PUBLISH_RATE = float(os.environ.get("SNS_PUBLISH_RATE", "300"))  # messages per second
+
+# PublishBatch accepts at most 10 entries per request, and at most 256 KiB
+# of messages, subjects and attributes across all of them
+PUBLISH_BATCH_SIZE = 10
+PUBLISH_MAX_BYTES = 256 * 1024
+# Appended to a message whose body had to be cut to fit on its own
+TRUNCATION_NOTE = "\n\n[This message was too long and has been shortened.]"
+# Publish batches allowed in flight before the reader waits for the pool
+MAX_PENDING_BATCHES = PUBLISH_WORKERS * 2
+
+# Without a schedule table reminders go out once a day, at the top of this UTC hour
+DAILY_REMINDER_HOUR = int(os.environ.get("DAILY_REMINDER_HOUR", "8"))
+
+# Days ahead digest runs read; 0 turns digests off. Without a schedule table
+# the daily run sends them too, otherwise they need a {"digest": true} run
+DIGEST_DAYS = int(os.environ.get("DIGEST_DAYS", "7"))
+# Weekday weekly digests go out on for users who haven't picked one (0 = Monday)
+DIGEST_WEEKDAY = int(os.environ.get("DIGEST_WEEKDAY", "0"))
+
+# Dedupe ledger of reminders already sent; leave empty to disable
+LEDGER_TABLE = os.environ.get("LEDGER_TABLE", "")
+
+# Queue of per-user reminder jobs for the delivery Lambda; leave empty to
+# publish from the scheduled run itself
+REMINDER_QUEUE_URL = os.environ.get("REMINDER_QUEUE_URL", "")
+
+# Runs stop once the next users' estimated cost would leave less than this
+# for saving a checkpoint and handing over to a new invocation. The new
+# invocation can land on any container, so runs are only continued with a
+# checkpoint table; without one they run until the Lambda times out
+CHECKPOINT_TABLE = os.environ.get("CHECKPOINT_TABLE", "")
+CHECKPOINT_MARGIN_MS = int(os.environ.get("CHECKPOINT_MARGIN_MS", "3000"))
+# Guards against a run that makes no progress re-invoking itself forever
+MAX_CONTINUATIONS = int(os.environ.get("MAX_CONTINUATIONS", "20"))
+
+# Per-phase timings and counts, one EMF line per invocation on stdout
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "EventPlanner/Notifications")
+# Set to a file path (or "-" for stderr) to send the EMF lines there instead,
+# for local runs and benchmarks
+METRICS_LOCAL_FILE = os.environ.get("METRICS_LOCAL_FILE", "")
 
 # AWS clients
 dynamodb = boto3.resource('dynamodb')
 sns = boto3.client('sns')
 events_table = dynamodb.Table(EVENTS_TABLE)
-users_table = dynamodb.Table(USERS_TABLE)
+schedule_table = dynamodb.Table(REMINDER_SCHEDULE_TABLE) if REMINDER_SCHEDULE_TABLE else None
+lambda_client = boto3.client('lambda')
+ledger = ReminderLedger(dynamodb.meta.client, LEDGER_TABLE) if LEDGER_TABLE else None
+reminder_queue = SqsReminderQueue(REMINDER_QUEUE_URL) if REMINDER_QUEUE_URL else None
+checkpoint_store = DynamoCheckpointStore(CHECKPOINT_TABLE) if CHECKPOINT_TABLE else None
+metrics = RunMetrics(
+    METRICS_NAMESPACE, {"Service": "notification", "RunType": "date"},
+    sink=file_sink(METRICS_LOCAL_FILE) if METRICS_LOCAL_FILE else None
+)
 
 def lambda_handler(event, context):
     """
-    EventBridge triggers this Lambda daily at 8 AM UTC.
-    Checks for events happening tomorrow and sends email reminders.
+    EventBridge triggers this Lambda every minute.
+    
+    With a reminder schedule table, sends the reminders due this UTC minute:
+    day-before reminders in each user's local morning, and the reminders
+    events ask for a set time before they start. Otherwise, once a day at
+    DAILY_REMINDER_HOUR UTC, sends reminders for every event happening
+    tomorrow.
+    
+    Digest runs read the next DIGEST_DAYS days in one pass and also send
+    each user whose digest is due a summary of their coming days (see
+    digest.py). Without a schedule table the daily run is a digest run and
+    sends both; with one, digests come from a separate daily invocation
+    with {"digest": true}, which sends only the digests.
+    
+    With a reminder queue, the run only finds who needs a reminder and
+    enqueues one job per user; delivery_handler renders and publishes them.
+    
+    The remaining invocation time is treated as a budget: once the next
+    users' estimated cost would not fit, the run stops, saves a checkpoint
+    and re-invokes itself with {"resume_run_id": ...} to finish the
+    remaining users. That needs a checkpoint table; a resume_run_id with
+    no checkpoint behind it is an error, never the start of a new run.
+    Every response carries a summary of the run so far,
+    and every invocation emits its phase timings as an EMF line (see
+    metrics.py).
     """
     
     print("Starting notification check...")
     
-    # Calculate tomorrow's date
-    tomorrow = datetime.now() + timedelta(days=1)
-    tomorrow_str = tomorrow.strftime("%Y-%m-%d")
+    event = event or {}
+    run_id = event.get('resume_run_id')
+    checkpoint = None
+    if run_id:
+        checkpoint = checkpoint_store.load(run_id) if checkpoint_store else None
+        if not checkpoint:
+            # Starting over would re-send what the run already sent
+            print(f"No checkpoint for run {run_id}, not resuming")
+            return {
+                "statusCode": 404,
+                "body": json.dumps({"message": "Unknown run", "run_id": run_id})
+            }
+    
+    if checkpoint:
+        # Keep the original run's target even if the window has passed since
+        target = checkpoint['target']
+        target_key = checkpoint['target_key']
+        digest_days = checkpoint.get('digest_days', 0)
+        stats = checkpoint['stats']
+        # Rows from the checkpointed position on are read again, so the read
+        # counters go back to what they were before it
+        if checkpoint['position']:
+            stats.update(checkpoint['position'].get('read', {}))
+        print(f"Resuming run {run_id} (continuation {checkpoint['continuations']})")
+    else:
+        run_time = scheduled_time(event)
+        digest_requested = bool(event.get('digest'))
+        digest_days = DIGEST_DAYS if digest_requested or not schedule_table else 0
+        if digest_requested and digest_days <= 0:
+            print("Digests are turned off (DIGEST_DAYS=0), nothing to do")
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"message": "Digests are turned off"})
+            }
+        
+        if schedule_table and not digest_requested:
+            # Minute bucket of the reminder schedule due now
+            target = run_time.strftime("%Y-%m-%dT%H:%M")
+            target_key = "window_checked"
+        elif (not digest_requested and 'time' in event
+              and (run_time.hour, run_time.minute) != (DAILY_REMINDER_HOUR, 0)):
+            print(f"Daily reminders go out at {DAILY_REMINDER_HOUR}:00 UTC, nothing to do")
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"message": "Not the daily reminder hour"})
+            }
+        else:
+            # Calculate tomorrow's date
+            tomorrow = run_time + timedelta(days=1)
+            target = tomorrow.strftime("%Y-%m-%d")
+            target_key = "date_checked"
+        run_id = getattr(context, 'aws_request_id', None) or f"run-{target}-{int(time.time())}"
+        stats = {
+            "total_events": 0,
+            "date_events": 0,
+            "consumed_read_units": 0.0,
+            "notifications_sent": 0,
+            "already_sent": 0,
+            "errors": 0,
+            "reminders_queued": 0
+        }
+    
+    # Digests only, when the day's reminders come from the schedule
+    digest = DigestPlan(target, digest_days, DIGEST_WEEKDAY) if digest_days > 0 else None
+    reminder_key = None if digest and schedule_table else target
+    if target_key == "window_checked":
+        print(f"Checking for reminders due in minute: {target}")
+    elif digest:
+        print(f"Checking for events from {target} over the next {digest_days} day(s)")
+    else:
+        print(f"Checking for events on: {target}")
     
-    print(f"Checking for events on: {tomorrow_str}")
+    metrics.set_dimension("RunType", "digest" if digest else target_key.split("_")[0])
+    metrics.set_property("RunId", run_id)
+    metrics.set_property("Target", target)
+    started = time.perf_counter()
     
     try:
-        # Scan DynamoDB for all events (since we need to check all users)
-        # In production, you might want to use a GSI for better performance
-        response = events_table.scan()
-        all_events = response.get('Items', [])
-        
-        # Continue scanning if there are more items
-        while 'LastEvaluatedKey' in response:
-            response = events_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            all_events.extend(response.get('Items', []))
-        print(f"Total events in database: {len(all_events)}")
-        # Filter events for tomorrow
-        tomorrow_events = [
-            event for event in all_events 
-            if event.get('date') == tomorrow_str
-        ]
-        
-        print(f"Events happening tomorrow: {len(tomorrow_events)}")
-        
-        # Group events by userId
-        events_by_user = {}
-        for event in tomorrow_events:
-            user_id = event.get('userId')
-            if user_id:
-                if user_id not in events_by_user:
-                    events_by_user[user_id] = []
-                events_by_user[user_id].append(event)
-        
-        # Send notifications for each user
-        notifications_sent = 0
-        errors = 0
-        
-        for user_id, user_events in events_by_user.items():
-            try:
-                send_notification(user_id, user_events, tomorrow_str)
-                notifications_sent += 1
-                print(f"✓ Sent notification to {user_id}")
-            except Exception as e:
-                errors += 1
-                print(f"✗ Failed to send notification to {user_id}: {str(e)}")
-        
-        result = {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Notification check complete",
-                "total_events": len(all_events),
-                "tomorrow_events": len(tomorrow_events),
-                "notifications_sent": notifications_sent,
-                "errors": errors,
-                "date_checked": tomorrow_str
+        # Stream due events page by page, grouping them by user as they
+        # arrive and publishing reminders as each group of users completes
+        start = checkpoint['position'] if checkpoint else None
+        skip = set(checkpoint['notified']) if checkpoint else set()
+        progress = RunProgress(start, skip)
+        
+        if digest:
+            events = iter_events_for_days(digest.dates(), stats, start)
+        elif target_key == "window_checked":
+            events = iter_scheduled_reminders(target, stats, start)
+        else:
+            events = iter_events_for_date(target, stats, start)
+        user_groups = group_events_by_user(events)
+        # Pages are timed as they are read; grouping is the rest of this
+        user_groups = metrics.timed(user_groups, "ReadAndGroupTime")
+        
+        def remaining_groups():
+            for user_id, user_events, position in user_groups:
+                if user_id in skip:
+                    continue
+                progress.add(position, user_id)
+                metrics.add("UsersProcessed", 1)
+                yield user_id, user_events
+        
+        # Without somewhere durable to checkpoint to, there's nothing to stop for
+        remaining_ms = getattr(context, 'get_remaining_time_in_millis', None) if checkpoint_store else None
+        budget = RunBudget(remaining_ms, CHECKPOINT_MARGIN_MS)
+        
+        if reminder_queue:
+            queued, errors, stopped = enqueue_reminders(remaining_groups(), reminder_key,
+                                                        budget=budget, digest=digest)
+            stats["reminders_queued"] += queued
+            stats["errors"] += errors
+            metrics.add("RemindersQueued", queued)
+            metrics.add("Errors", errors)
+        else:
+            notifications_sent, already_sent, errors, stopped = publish_reminders(
+                remaining_groups(), reminder_key, budget=budget, digest=digest
+            )
+            stats["notifications_sent"] += notifications_sent
+            stats["already_sent"] += already_sent
+            stats["errors"] += errors
+            metrics.add("NotificationsSent", notifications_sent)
+            metrics.add("AlreadySent", already_sent)
+            metrics.add("Errors", errors)
+        metrics.add("EstimatedUserCost", budget.user_ms, MILLISECONDS)
+        
+        if stopped:
+            metrics.add("Continuations", 1)
+            print(f"Stopping early: {budget.describe()}")
+            return continue_run(run_id, context, {
+                "target": target,
+                "target_key": target_key,
+                "digest_days": digest_days,
+                "position": progress.position,
+                "notified": progress.notified(),
+                "stats": stats,
+                "continuations": (checkpoint['continuations'] if checkpoint else 0) + 1
             })
-        }
         
-        print(f"Summary: {notifications_sent} notifications sent, {errors} errors")
-        return result
+        if checkpoint:
+            checkpoint_store.delete(run_id)
+        
+        print(f"Total events read: {stats['total_events']}")
+        print(f"Events in range: {stats['date_events']}")
+        print(f"Read capacity consumed: {stats['consumed_read_units']} RCUs")
+        
+        return run_summary(200, "Notification check complete", stats, target_key, target)
         
     except Exception as e:
         print(f"Error in notification handler: {str(e)}")
-        return {
-            "statusCode": 500,
-            "body": json.dumps({
-                "error": str(e)
-            })
+        # Whatever was sent before the failure is still reported
+        metrics.add("RunFailures", 1)
+        return run_summary(500, "Notification check failed", stats, target_key, target,
+                           error=str(e))
+    finally:
+        metrics.add("GroupTime", max(0.0, metrics.value("ReadAndGroupTime") - metrics.value("ReadTime")),
+                    MILLISECONDS)
+        metrics.add("RunTime", (time.perf_counter() - started) * 1000, MILLISECONDS)
+        metrics.flush()
+
+def run_summary(status_code, message, stats, target_key, target, **extra):
+    """Handler response summarising a run (complete, continuing or failed)"""
+    print(f"Summary: {stats['notifications_sent']} notifications sent, "
+          f"{stats['already_sent']} already sent, {stats['errors']} errors, "
+          f"{stats.get('reminders_queued', 0)} queued for delivery")
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(dict({
+            "message": message,
+            "total_events": stats["total_events"],
+            "tomorrow_events": stats["date_events"],
+            "consumed_read_units": stats["consumed_read_units"],
+            "notifications_sent": stats["notifications_sent"],
+            "already_sent": stats["already_sent"],
+            "errors": stats["errors"],
+            "reminders_queued": stats.get("reminders_queued", 0),
+            target_key: target
+        }, **extra))
+    }
+
+def continue_run(run_id, context, state):
+    """
+    Save a checkpoint and hand the rest of the run to a new async invocation.
+    """
+    summary = (state["stats"], state["target_key"], state["target"])
+    if state["continuations"] > MAX_CONTINUATIONS:
+        print(f"Run {run_id} hit {MAX_CONTINUATIONS} continuations, giving up")
+        checkpoint_store.delete(run_id)
+        return run_summary(500, "Notification run did not finish", *summary, run_id=run_id)
+    
+    checkpoint_store.save(run_id, state)
+    try:
+        lambda_client.invoke(
+            FunctionName=context.function_name,
+            InvocationType='Event',
+            Payload=json.dumps({"resume_run_id": run_id})
+        )
+    except Exception as e:
+        # The checkpoint stays, so the run can be resumed by hand
+        print(f"Could not continue run {run_id}: {str(e)}")
+        return run_summary(500, "Notification check stopped", *summary,
+                           run_id=run_id, error=str(e), resume={"resume_run_id": run_id})
+    
+    print(f"Checkpointed run {run_id}, continuing in a new invocation")
+    return run_summary(202, "Notification check continuing", *summary, run_id=run_id)
+
+def scheduled_time(event):
+    """UTC time this run was scheduled for (EventBridge 'time', else now)"""
+    try:
+        return datetime.strptime(event['time'], "%Y-%m-%dT%H:%M:%SZ")
+    except (KeyError, TypeError, ValueError):
+        return datetime.utcnow()
+
+def iter_scheduled_reminders(window, stats, start=None):
+    """
+    Yield (position, reminder) for the schedule rows due in a minute window.
+    
+    Reads the window's partition in each shard; rows come back sorted by
+    userId and carry the event fields the email needs.
+    
+    Args:
+        window: UTC minute bucket (YYYY-MM-DDTHH:MM)
+        stats: Dict whose total_events/date_events/consumed_read_units
+            counters are incremented
+        start: Position to resume reading from (None to read everything)
+    """
+    first_shard, start_key = 0, None
+    if start and start.get('source') == 'schedule':
+        first_shard, start_key = start['shard'], start['start_key']
+    
+    for shard in range(first_shard, REMINDER_SHARDS):
+        yield from query_pages(schedule_table, stats, {
+            'ProjectionExpression': SCHEDULE_PROJECTION,
+            'KeyConditionExpression': '#bk = :bucket',
+            'ExpressionAttributeNames': dict(EVENT_PROJECTION_NAMES, **{'#bk': 'bucket'}),
+            'ExpressionAttributeValues': {':bucket': {'S': f"{window}#{shard}"}},
+            'ReturnConsumedCapacity': 'TOTAL'
+        }, {'source': 'schedule', 'shard': shard}, start_key if shard == first_shard else None)
+
+def iter_events_for_date(date_str, stats, start=None):
+    """
+    Yield (position, event) for the events happening on the given date.
+    
+    Queries the date GSI so only that day's partition is read, already
+    sorted by userId. Falls back to a parallel scan of the whole table when
+    no index is configured, with the date pushed down as a FilterExpression
+    (see iter_scanned_events). Either way only the attributes the email
+    needs are fetched.
+    
+    Position identifies the page an event was read from (or for scans, the
+    user before it), so a run can be resumed from it.
+    
+    Args:
+        date_str: Date string (YYYY-MM-DD)
+        stats: Dict whose total_events/date_events/consumed_read_units
+            counters are incremented
+        start: Position to resume reading from (None to read everything)
+    """
+    if not EVENTS_DATE_INDEX:
+        yield from iter_scanned_events(stats, start, '#dt = :date', {':date': date_str})
+        return
+    
+    read_kwargs = {
+        'ProjectionExpression': EVENT_PROJECTION,
+        'ExpressionAttributeNames': EVENT_PROJECTION_NAMES,
+        'ReturnConsumedCapacity': 'TOTAL'
+    }
+    start_key = start['start_key'] if start and start.get('source') == 'index' else None
+    yield from query_pages(events_table, stats, dict(
+        read_kwargs,
+        IndexName=EVENTS_DATE_INDEX,
+        KeyConditionExpression='#dt = :date',
+        ExpressionAttributeValues={':date': {'S': date_str}}
+    ), {'source': 'index', 'shard': None}, start_key)
+
+def iter_events_for_days(dates, stats, start=None):
+    """
+    Yield (position, event) for the events on any of the given dates, with
+    each user's events for all of the dates together.
+    
+    The date index is partitioned by date, so there is no single range
+    read across days: every day's partition is queried (sorted by userId)
+    and the pages are merged by userId as they are read. That is one pass
+    reading the same items a range read would, without holding more than
+    one page per day. The scan fallback filters on the date range instead.
+    
+    Position is the last user before the event's user, so a run resumes
+    by reading every day from the next user on.
+    
+    Args:
+        dates: Date strings (YYYY-MM-DD), in order
+        stats: Dict whose total_events/date_events/consumed_read_units
+            counters are incremented
+        start: Position to resume reading from (None to read everything)
+    """
+    if not EVENTS_DATE_INDEX:
+        yield from iter_scanned_events(stats, start, '#dt BETWEEN :first AND :last',
+                                       {':first': dates[0], ':last': dates[-1]})
+        return
+    
+    after = start['after'] if start and start.get('source') == 'days' else None
+    condition = '#dt = :date AND userId > :after' if after else '#dt = :date'
+    
+    def day_events(date):
+        """(capacity units, event) for one day; the pages' own totals are discarded"""
+        values = {':date': {'S': date}}
+        if after:
+            values[':after'] = {'S': after}
+        page_stats = {name: 0 for name in READ_STATS}
+        for position, event in query_pages(events_table, page_stats, {
+            'IndexName': EVENTS_DATE_INDEX,
+            'ProjectionExpression': EVENT_PROJECTION,
+            'KeyConditionExpression': condition,
+            'ExpressionAttributeNames': EVENT_PROJECTION_NAMES,
+            'ExpressionAttributeValues': values,
+            'ReturnConsumedCapacity': 'TOTAL'
+        }, {'source': 'days', 'shard': None}):
+            # Key-only queries return every item they read
+            page_units = page_stats['consumed_read_units'] - position['read']['consumed_read_units']
+            page_items = page_stats['date_events'] - position['read']['date_events']
+            yield page_units / page_items, event
+    
+    # Read counters go up as events are merged rather than as pages arrive,
+    # so at each position they cover exactly the users before it
+    current_user, position = None, None
+    for units, event in merge(*(day_events(date) for date in dates), key=lambda pair: pair[1].user_id):
+        if event.user_id != current_user:
+            position = {'source': 'days', 'after': current_user or after, 'read': read_totals(stats)}
+            current_user = event.user_id
+        stats["total_events"] += 1
+        stats["date_events"] += 1
+        stats["consumed_read_units"] += units
+        yield position, event
+
+def iter_scanned_events(stats, start, filter_expression, filter_values):
+    """
+    Yield (position, event) for a parallel scan of the events table, sorted
+    by user (and date).
+    
+    A scan can't be resumed part way, so it is read in full first, holding
+    only the events that pass the filter, then handed on a user at a time.
+    Position is the user before the event's user, so a resumed run scans
+    again and skips the users up to it, and its checkpoint stays small.
+    """
+    # Scanned again on resume, so positions restore the counters to here
+    read_before = read_totals(stats)
+    after = start['after'] if start and start.get('source') == 'scan' else None
+    segment_stats = []
+    events = []
+    for event in parallel_scan(EVENTS_TABLE, total_segments=SCAN_SEGMENTS,
+                               segment_stats=segment_stats,
+                               FilterExpression=filter_expression,
+                               ExpressionAttributeValues=filter_values,
+                               ProjectionExpression=EVENT_PROJECTION,
+                               ExpressionAttributeNames=EVENT_PROJECTION_NAMES,
+                               ReturnConsumedCapacity='TOTAL'):
+        stats["date_events"] += 1
+        record = EventRecord.from_item(event)
+        if record.user_id and (after is None or record.user_id > after):
+            events.append(record)
+    
+    # Every segment has finished once the stream is exhausted
+    record_scan(stats, segment_stats)
+    
+    events.sort(key=lambda event: (event.user_id, event.date or ''))
+    current_user, position = None, None
+    for event in events:
+        if event.user_id != current_user:
+            position = {'source': 'scan', 'after': current_user or after, 'read': read_before}
+            current_user = event.user_id
+        yield position, event
+
+def read_totals(stats):
+    """Copy of the read counters in stats"""
+    return {name: stats[name] for name in READ_STATS}
+
+def record_scan(stats, segment_stats):
+    """Add a finished parallel scan's per-segment totals to stats and metrics"""
+    stats["total_events"] += sum(segment["scanned"] for segment in segment_stats)
+    stats["consumed_read_units"] += sum(segment["capacity_units"] for segment in segment_stats)
+    # Segments run side by side, so the slowest one is the read time
+    metrics.add("ReadTime", max((segment["seconds"] for segment in segment_stats), default=0) * 1000,
+                MILLISECONDS)
+    for segment in segment_stats:
+        metrics.observe("ScanSegmentLatency", segment["seconds"] * 1000)
+        metrics.add("ReadPages", segment["pages"])
+        metrics.add("ItemsRead", segment["scanned"])
+
+def query_pages(table, stats, query_kwargs, source, start_key=None, convert=EventRecord.from_wire):
+    """
+    Yield (position, item) for every item of a query, following
+    LastEvaluatedKey and updating stats.
+    
+    Queries go through the low-level client, so query_kwargs (and start
+    keys) are in wire format; each item is passed through convert, which
+    builds a compact EventRecord by default.
+    
+    Positions carry the read counters from before their page, which a run
+    resuming from one (and so reading the page again) restores.
+    """
+    while True:
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = start_key
+        position = dict(source, start_key=start_key, read=read_totals(stats))
+        
+        with metrics.timer("ReadTime", histogram="QueryLatency"):
+            response = table.meta.client.query(TableName=table.name, **query_kwargs)
+        items = response.get('Items', [])
+        metrics.add("ReadPages", 1)
+        metrics.add("ItemsRead", response.get('ScannedCount', len(items)))
+        stats["total_events"] += response.get('ScannedCount', len(items))
+        stats["date_events"] += len(items)
+        stats["consumed_read_units"] += response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+        for item in items:
+            yield position, convert(item)
+        
+        if 'LastEvaluatedKey' not in response:
+            break
+        start_key = response['LastEvaluatedKey']
+
+def group_events_by_user(events):
+    """
+    Group a stream of (position, event) pairs sorted by userId into
+    (user_id, events, position) tuples, where position is that of the
+    user's first event. Each group is yielded as soon as the next user's
+    events start.
+    """
+    current_user, current_events, current_position = None, [], None
+    for position, event in events:
+        user_id = event.get('userId')
+        if not user_id:
+            continue
+        if user_id != current_user:
+            if current_events:
+                yield current_user, current_events, current_position
+            current_user, current_events, current_position = user_id, [], position
+        current_events.append(event)
+    
+    if current_events:
+        yield current_user, current_events, current_position
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items from any iterable"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def message_size(message):
+    """Bytes a rendered message counts against the SNS payload limit"""
+    size = len(message['Message'].encode()) + len(message.get('Subject', '').encode())
+    for name, attribute in message.get('MessageAttributes', {}).items():
+        size += len(name.encode()) + len(attribute['DataType'].encode())
+        size += len(attribute.get('StringValue', '').encode())
+    return size
+
+def fit_message(message, max_bytes=PUBLISH_MAX_BYTES):
+    """The message, with its body cut short if it alone is over max_bytes"""
+    excess = message_size(message) - max_bytes
+    if excess <= 0:
+        return message
+    metrics.add("MessagesTruncated", 1)
+    body = message['Message'].encode()
+    keep = max(0, len(body) - excess - len(TRUNCATION_NOTE.encode()))
+    # Cutting mid-character leaves a partial sequence, which is dropped
+    return dict(message, Message=body[:keep].decode(errors='ignore') + TRUNCATION_NOTE)
+
+def publish_batches(messages):
+    """
+    Split (user_id, reminder_key, message) tuples into PublishBatch
+    requests within both the entry count and the payload size limits.
+    Messages must already fit on their own (see fit_message).
+    """
+    batch, batch_bytes = [], 0
+    for entry in messages:
+        size = message_size(entry[2])
+        if batch and (len(batch) == PUBLISH_BATCH_SIZE or batch_bytes + size > PUBLISH_MAX_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(entry)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+def publish_reminders(user_groups, reminder_key, budget=None, failed_users=None, digest=None):
+    """
+    Look up, render and publish reminders for a stream of user groups.
+    
+    Users are handled 100 at a time: one ledger check drops users already
+    reminded by an earlier or overlapping run, one BatchGetItem fetches the
+    rest's profiles, then their reminders go out up to 10 (and 256 KiB) per
+    PublishBatch call on
+    a bounded, rate-limited thread pool, users whose events start soonest
+    first. (Groups are read in key order so a stopped run can resume from
+    its checkpoint, so priority only applies within each 100.)
+    
+    With a digest plan, users' events cover several days: each user gets a
+    reminder for their events on the reminder_key date, if any, and a
+    digest of the coming days if theirs is due.
+    
+    Args:
+        user_groups: Iterable of (user_id, events) tuples
+        reminder_key: What the reminders are for (the event date, or the
+            schedule window); a user gets one reminder per key. None with a
+            digest plan sends only the digests
+        budget: Optional RunBudget; timed after every chunk of users, and
+            no further groups are read once the next chunk won't fit
+        failed_users: Optional set the ids of users with a reminder or
+            digest that failed are added to
+        digest: Optional DigestPlan for the days the events cover
+    
+    Returns:
+        Tuple of (notifications_sent, already_sent, errors, stopped). Every
+        group read from user_groups has been handled by the time this returns.
+    """
+    counts = {"sent": 0, "skipped": 0, "errors": 0}
+    limiter = TokenBucket(SNS_PUBLISH_RATE, capacity=max(SNS_PUBLISH_RATE, PUBLISH_BATCH_SIZE))
+    
+    # Entries are identified by (user_id, reminder_key): a user can get a
+    # reminder and a digest in the same run, each with its own ledger row
+    def send(batch):
+        skipped = set()
+        if ledger:
+            # Conditional claim; loses only to a run sending the same reminder
+            claimed = []
+            try:
+                for entry in batch:
+                    if ledger.claim(*entry[:2]):
+                        claimed.append(entry[:2])
+                    else:
+                        skipped.add(entry[:2])
+            except Exception:
+                # Hand back the claims already taken so a retry can send
+                # them, rather than waiting out the stale window
+                ledger.release(claimed)
+                raise
+            batch = [entry for entry in batch if entry[:2] not in skipped]
+            if not batch:
+                return {}, skipped
+        
+        # SNS throttles on messages, not API calls
+        with metrics.timer("RateLimitWaitTime"):
+            limiter.acquire(len(batch))
+        try:
+            with metrics.timer("PublishTime", histogram="PublishLatency"):
+                failed_entries = send_notification_batch(batch)
+        except Exception as e:
+            # The whole request failed, so every entry claimed for it did
+            metrics.add("PublishErrors", 1)
+            if ledger:
+                ledger.release([entry[:2] for entry in batch])
+            return {entry[:2]: str(e) for entry in batch}, skipped
+        
+        failed = {batch[index][:2]: error for index, error in failed_entries.items()}
+        if ledger:
+            ledger.release([entry[:2] for entry in batch if entry[:2] in failed])
+            ledger.mark_sent([entry[:2] for entry in batch if entry[:2] not in failed])
+        return failed, skipped
+    
+    def record(future, batch):
+        try:
+            failed, skipped = future.result()
+        except Exception as e:
+            # The ledger failed before anything was published
+            failed, skipped = {entry[:2]: str(e) for entry in batch}, set()
+        
+        for user_id, key, _ in batch:
+            if (user_id, key) in skipped:
+                counts["skipped"] += 1
+                print(f"- Skipped {user_id} ({key}), reminder already sent")
+            elif (user_id, key) in failed:
+                counts["errors"] += 1
+                if failed_users is not None:
+                    failed_users.add(user_id)
+                print(f"✗ Failed to send notification to {user_id} ({key}): {failed[(user_id, key)]}")
+            else:
+                counts["sent"] += 1
+                print(f"✓ Sent notification to {user_id} ({key})")
+    
+    pending = {}
+    stopped = False
+    with ThreadPoolExecutor(max_workers=PUBLISH_WORKERS) as executor:
+        chunk_started = time.monotonic()
+        for chunk in chunked(user_groups, BATCH_GET_SIZE):
+            users_read = len(chunk)
+            chunk = sorted(
+                message_groups(chunk, reminder_key, digest),
+                key=lambda group: reminder_priority(group[2])
+            )
+            if ledger:
+                with metrics.timer("LedgerTime"):
+                    already_sent = ledger.sent_reminders([group[:2] for group in chunk])
+                counts["skipped"] += len(already_sent)
+                chunk = [group for group in chunk if group[:2] not in already_sent]
+            
+            # A user can have both a reminder and a digest in the chunk
+            with metrics.timer("LookupTime"):
+                profiles = fetch_user_profiles(list(dict.fromkeys(user_id for user_id, _, _ in chunk)))
+            messages = []
+            with metrics.timer("RenderTime"):
+                for user_id, key, user_events in chunk:
+                    if digest and key == digest.key:
+                        message = digest.render(user_id, user_events, profiles.get(user_id))
+                    else:
+                        message = render_notification(user_id, user_events, user_events[0].get('date'),
+                                                      profiles.get(user_id))
+                    if message:
+                        messages.append((user_id, key, fit_message(message)))
+            for batch in publish_batches(messages):
+                pending[executor.submit(send, batch)] = batch
+            
+            # Don't read further ahead than the publishers can keep up with
+            while len(pending) > MAX_PENDING_BATCHES:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future, pending.pop(future))
+            
+            if budget:
+                budget.record(users_read, time.monotonic() - chunk_started)
+                chunk_started = time.monotonic()
+                in_flight = sum(len(batch) for batch in pending.values())
+                if budget.exhausted(BATCH_GET_SIZE + in_flight):
+                    stopped = True
+                    break
+        
+        for future in as_completed(list(pending)):
+            record(future, pending.pop(future))
+    
+    return counts["sent"], counts["skipped"], counts["errors"], stopped
+
+def message_groups(user_groups, reminder_key, digest=None):
+    """
+    (user_id, reminder_key, events) for every message users may get: one
+    reminder per user, or with a digest plan, a reminder for the events on
+    the reminder_key date and a digest (keyed digest.key) over all of them.
+    Whether a digest is actually due is only known once the profile is.
+    """
+    for user_id, user_events in user_groups:
+        if not digest:
+            yield user_id, reminder_key, user_events
+            continue
+        day_events = [event for event in user_events if event.get('date') == reminder_key]
+        if day_events:
+            yield user_id, reminder_key, day_events
+        yield user_id, digest.key, user_events
+
+def enqueue_reminders(user_groups, reminder_key, budget=None, digest=None):
+    """
+    Enqueue one reminder job per user for the delivery Lambda.
+    
+    Jobs go out up to 10 (and 256 KiB) per SendMessageBatch call on a
+    bounded thread pool; the ledger check, profile lookup and publishing all
+    happen on delivery. A job that is too big, or that SQS keeps rejecting,
+    is counted as an error and the run carries on with the next users.
+    
+    Args:
+        user_groups: Iterable of (user_id, events) tuples
+        reminder_key: What the reminders are for (see publish_reminders)
+        budget: Optional RunBudget, checked between batches of users
+        digest: Optional DigestPlan, passed on to delivery with each job
+    
+    Returns:
+        Tuple of (jobs_queued, jobs_failed, stopped). Every group read from
+        user_groups has been handled by the time this returns.
+    """
+    queued = failed = 0
+    pending = set()
+    stopped = False
+    
+    def send(bodies):
+        try:
+            with metrics.timer("EnqueueTime", histogram="EnqueueLatency"):
+                errors = reminder_queue.send_batch(bodies)
+        except Exception as e:
+            errors = [str(e)] * len(bodies)
+        if errors:
+            print(f"✗ Failed to queue {len(errors)} reminder job(s): {errors[0]}")
+        return len(bodies) - len(errors), len(errors)
+    
+    def done(futures):
+        nonlocal queued, failed
+        for future in futures:
+            sent, errors = future.result()
+            queued += sent
+            failed += errors
+    
+    with ThreadPoolExecutor(max_workers=PUBLISH_WORKERS) as executor:
+        batch_started = time.monotonic()
+        for batch in chunked(user_groups, SEND_BATCH_SIZE):
+            bodies = []
+            for user_id, user_events in batch:
+                try:
+                    bodies.append(encode_job(user_id, reminder_key, user_events,
+                                             digest.as_dict() if digest else None))
+                except JobTooLarge as e:
+                    failed += 1
+                    print(f"✗ {str(e)}")
+            for bodies_batch in job_batches(bodies):
+                pending.add(executor.submit(send, bodies_batch))
+            
+            while len(pending) > MAX_PENDING_BATCHES:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                done(finished)
+            
+            if budget:
+                budget.record(len(batch), time.monotonic() - batch_started)
+                batch_started = time.monotonic()
+                if budget.exhausted(SEND_BATCH_SIZE * (len(pending) + 1)):
+                    stopped = True
+                    break
+        
+        done(as_completed(pending))
+    
+    print(f"Queued {queued} reminder jobs for {reminder_key or digest.key}, {failed} failed")
+    return queued, failed, stopped
+
+def delivery_handler(event, context):
+    """
+    SQS-triggered delivery of reminder jobs queued by lambda_handler.
+    
+    Renders and publishes every job in the batch and reports the jobs that
+    failed as batch item failures, so SQS retries only those.
+    """
+    records = event.get('Records', [])
+    jobs = {}
+    for record in records:
+        user_id, reminder_key, events, digest = decode_job(record['body'])
+        group = (reminder_key, json.dumps(digest, sort_keys=True) if digest else None)
+        jobs.setdefault(group, []).append((record['messageId'], user_id, events))
+    
+    failures = []
+    totals = {"sent": 0, "skipped": 0, "errors": 0}
+    for (reminder_key, digest), key_jobs in jobs.items():
+        failed_users = set()
+        try:
+            sent, skipped, errors, _ = publish_reminders(
+                [(user_id, events) for _, user_id, events in key_jobs],
+                reminder_key,
+                failed_users=failed_users,
+                digest=DigestPlan.from_dict(json.loads(digest)) if digest else None
+            )
+        except Exception as e:
+            print(f"Error delivering reminders for {reminder_key or 'digests'}: {str(e)}")
+            failed_users = {user_id for _, user_id, _ in key_jobs}
+            sent, skipped, errors = 0, 0, len(key_jobs)
+        totals["sent"] += sent
+        totals["skipped"] += skipped
+        totals["errors"] += errors
+        failures.extend(
+            {"itemIdentifier": message_id}
+            for message_id, user_id, _ in key_jobs if user_id in failed_users
+        )
+    
+    print(f"Delivered {len(records)} jobs: {totals['sent']} sent, "
+          f"{totals['skipped']} already sent, {totals['errors']} errors")
+    metrics.set_dimension("RunType", "delivery")
+    metrics.add("JobsReceived", len(records))
+    metrics.add("NotificationsSent", totals["sent"])
+    metrics.add("AlreadySent", totals["skipped"])
+    metrics.add("Errors", totals["errors"])
+    metrics.add("JobsFailed", len(failures))
+    metrics.flush()
+    return {"batchItemFailures": failures}
+
+def reminder_priority(events):
+    """
+    Sort key putting users whose events start soonest first: the shortest
+    reminder offset, then the earliest date and time ("HH:MM" sorts before
+    free text like "Not specified").
+    """
+    return min(
+        (event.get('offsetMinutes', float('inf')), event.get('date', ''), event.get('time', ''))
+        for event in events
+    )
+
+def fetch_user_profiles(user_ids):
+    """
+    Resolve user profiles with chunked BatchGetItem calls.
+    
+    Keys DynamoDB leaves unprocessed are retried with exponential backoff.
+    Users that can't be resolved are left out of the result.
+    
+    Args:
+        user_ids: List of user emails
+    
+    Returns:
+        Dict mapping email -> user item (PROFILE_PROJECTION attributes only)
+    """
+    profiles = {}
+    
+    for start in range(0, len(user_ids), BATCH_GET_SIZE):
+        request_items = {
+            USERS_TABLE: {
+                'Keys': [{"email": user_id} for user_id in user_ids[start:start + BATCH_GET_SIZE]],
+                'ProjectionExpression': PROFILE_PROJECTION
+            }
         }
+        
+        attempt = 0
+        while request_items:
+            try:
+                with metrics.timer("BatchGetTime", histogram="BatchGetLatency"):
+                    batch_response = dynamodb.batch_get_item(RequestItems=request_items)
+            except Exception as e:
+                metrics.add("LookupErrors", 1)
+                print(f"Warning: Could not fetch user details batch: {str(e)}")
+                break
+            
+            for user in batch_response.get('Responses', {}).get(USERS_TABLE, []):
+                profiles[user['email']] = user
+            
+            request_items = batch_response.get('UnprocessedKeys') or {}
+            if not request_items:
+                break
+            
+            # Keys DynamoDB left unprocessed were throttled
+            metrics.add("LookupThrottledKeys", len(request_items.get(USERS_TABLE, {}).get('Keys', [])))
+            attempt += 1
+            if attempt > BATCH_GET_MAX_RETRIES:
+                unprocessed = len(request_items.get(USERS_TABLE, {}).get('Keys', []))
+                print(f"Warning: Gave up on {unprocessed} unprocessed user lookups")
+                break
+            
+            # Back off with jitter before retrying throttled keys
+            metrics.add("LookupRetries", 1)
+            delay = BATCH_GET_BASE_DELAY * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay))
+    
+    return profiles
+
+def describe_lead_time(minutes):
+    """Human-readable lead time for a reminder offset in minutes (90 -> 1 hour 30 minutes)"""
+    days, rest = divmod(int(minutes), 24 * 60)
+    hours, mins = divmod(rest, 60)
+    parts = [
+        f"{count} {unit}" + ("" if count == 1 else "s")
+        for count, unit in ((days, "day"), (hours, "hour"), (mins, "minute"))
+        if count
+    ]
+    return " ".join(parts)
 
-def send_notification(user_id, events, event_date):
+def render_notification(user_id, events, event_date, profile=None):
     """
-    Send email notification to user about their upcoming events.
+    Build the reminder email for a user's upcoming events.
     
     Args:
         user_id: Email of the user
-        events: List of events happening tomorrow
+        events: List of events to remind about; events from the schedule
+            with an offsetMinutes are reminded that long before they start,
+            the rest are happening tomorrow
         event_date: Date string (YYYY-MM-DD)
+        profile: User item from fetch_user_profiles (None if not found)
+    
+    Returns:
+        Dict with Subject, Message and MessageAttributes for SNS
     """
     
-    # Get user details to get their full name
-    try:
-        user_response = users_table.get_item(Key={"email": user_id})
-        user = user_response.get('Item', {})
-        full_name = user.get('full_name', 'User')
-    except Exception as e:
-        print(f"Warning: Could not fetch user details for {user_id}: {str(e)}")
-        full_name = 'User'
+    full_name = (profile or {}).get('full_name', 'User')
+    
+    offsets = sorted(int(event['offsetMinutes']) for event in events if event.get('offsetMinutes'))
     
     # Build email content
-    subject = f"📅 Reminder: You have {len(events)} event(s) tomorrow ({event_date})"
+    if not offsets:
+        subject = f"📅 Reminder: You have {len(events)} event(s) tomorrow ({event_date})"
+    elif len(events) == 1:
+        subject = f"⏰ Reminder: {events[0].get('title', 'Your event')} starts in {describe_lead_time(offsets[0])}"
+    else:
+        subject = f"⏰ Reminder: You have {len(events)} event(s) starting soon ({event_date})"
     
     # Email body
     body_lines = [
@@ -130,6 +1022,8 @@ def send_notification(user_id, events, event_date):
         body_lines.append(f"Event {i}: {event.get('title', 'Untitled')}")
         body_lines.append(f"  📅 Date: {event.get('date', 'N/A')}")
         body_lines.append(f"  🕐 Time: {event.get('time', 'Not specified')}")
+        if event.get('offsetMinutes'):
+            body_lines.append(f"  ⏰ Starts in: {describe_lead_time(event['offsetMinutes'])}")
         body_lines.append(f"  📍 Venue: {event.get('venue', 'Not specified')}")
         body_lines.append(f"  📝 Details: {event.get('details', 'No details')}")
         body_lines.append("")
@@ -145,44 +1039,67 @@ def send_notification(user_id, events, event_date):
         "",
         "---",
         "This is an automated reminder from Event Planner.",
+        "You're receiving this because you asked to be reminded before these event(s)."
+        if offsets else
         "You're receiving this because you have events scheduled for tomorrow."
     ])
     
     email_body = "\n".join(body_lines)
     
-    # Send via SNS
-    try:
-        response = sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=email_body,
-            MessageAttributes={
-                'user_email': {
-                    'DataType': 'String',
-                    'StringValue': user_id
-                },
-                'event_date': {
-                    'DataType': 'String',
-                    'StringValue': event_date
-                },
-                'event_count': {
-                    'DataType': 'Number',
-                    'StringValue': str(len(events))
-                }
+    return {
+        'Subject': subject,
+        'Message': email_body,
+        'MessageAttributes': {
+            'user_email': {
+                'DataType': 'String',
+                'StringValue': user_id
+            },
+            'event_date': {
+                'DataType': 'String',
+                'StringValue': event_date
+            },
+            'event_count': {
+                'DataType': 'Number',
+                'StringValue': str(len(events))
             }
-        )
-        
-        message_id = response.get('MessageId')
-        print(f"Email sent successfully. MessageId: {message_id}")
-        
-        return {
-            "success": True,
-            "message_id": message_id
         }
-        
-    except Exception as e:
-        print(f"Failed to send email via SNS: {str(e)}")
-        raise
+    }
+
+def send_notification_batch(batch):
+    """
+    Publish up to 10 rendered reminders with a single SNS PublishBatch call
+    (batches come from publish_batches, so they are within the size limit).
+    
+    Args:
+        batch: List of (user_id, reminder_key, message) tuples, where
+            message comes from render_notification
+    
+    Returns:
+        Dict mapping the index in batch -> error message for entries SNS
+        rejected (a user can have more than one entry in a batch)
+    """
+    
+    # Entry ids only need to be unique within the request
+    entries = [
+        dict(message, Id=str(i))
+        for i, (_, _, message) in enumerate(batch)
+    ]
+    
+    response = sns.publish_batch(
+        TopicArn=SNS_TOPIC_ARN,
+        PublishBatchRequestEntries=entries
+    )
+    
+    failed = {}
+    for failure in response.get('Failed', []):
+        failed[int(failure['Id'])] = f"{failure.get('Code')}: {failure.get('Message', '')}"
+        # Throttled entries ("Throttling", "ThrottledException") vs other rejections
+        if 'Throttl' in str(failure.get('Code')):
+            metrics.add("PublishThrottles", 1)
+        else:
+            metrics.add("PublishRejected", 1)
+    
+    return failed
 
 def decimal_default(obj):
     """Helper to convert Decimal to float for JSON"""
@@ -0,0 +1,132 @@
+"""
+Parallel segmented scan for DynamoDB tables.
+
+Used by the notification service when a full scan can't be avoided
+(index backfills, re-sending a missed day, audits) and from admin scripts:
+
+    python parallel_scan.py EventsTable --segments 8
+"""
+
+import argparse
+import queue
+import threading
+import time
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SEGMENTS = 4
+
+# Max pages buffered between the scan threads and the consumer
+QUEUE_PAGES_PER_SEGMENT = 2
+
+_SEGMENT_DONE = object()
+
+
+def default_table_factory(table_name):
+    """Build a Table on its own session (boto3 resources are not thread-safe)"""
+    return boto3.session.Session().resource('dynamodb').Table(table_name)
+
+
+def parallel_scan(table_name, total_segments=DEFAULT_SEGMENTS, max_workers=None,
+                  table_factory=None, segment_stats=None, **scan_kwargs):
+    """
+    Scan a table with DynamoDB Segment/TotalSegments and yield items as one stream.
+
+    Args:
+        table_name: Name of the DynamoDB table to scan
+        total_segments: Number of scan segments to split the table into
+        max_workers: Thread pool size (defaults to one thread per segment)
+        table_factory: Callable(table_name) returning a Table for a worker thread
+        segment_stats: Optional list; one throughput dict per segment is appended
+        **scan_kwargs: Extra arguments passed to every Table.scan call
+
+    Yields:
+        Items from all segments, in arrival order
+    """
+    table_factory = table_factory or default_table_factory
+    max_workers = max_workers or total_segments
+    pages = queue.Queue(maxsize=total_segments * QUEUE_PAGES_PER_SEGMENT)
+    stop = threading.Event()
+
+    def put(value):
+        # Give up if the consumer stopped reading, instead of blocking forever
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_segment(segment):
+        stats = {"segment": segment, "pages": 0, "items": 0, "scanned": 0, "capacity_units": 0.0}
+        started = time.monotonic()
+        try:
+            table = table_factory(table_name)
+            kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+            while not stop.is_set():
+                response = table.scan(**kwargs)
+                items = response.get('Items', [])
+                stats["pages"] += 1
+                stats["items"] += len(items)
+                stats["scanned"] += response.get('ScannedCount', len(items))
+                # Only present when the caller passes ReturnConsumedCapacity
+                stats["capacity_units"] += response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+                if items and not put(items):
+                    break
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            put(e)
+        finally:
+            elapsed = time.monotonic() - started
+            stats["seconds"] = round(elapsed, 3)
+            stats["items_per_second"] = round(stats["items"] / elapsed, 1) if elapsed else 0.0
+            if segment_stats is not None:
+                segment_stats.append(stats)
+            print(f"Scan segment {segment}/{total_segments}: {stats['items']} items, "
+                  f"{stats['pages']} pages in {stats['seconds']}s "
+                  f"({stats['items_per_second']} items/s)")
+            put(_SEGMENT_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+
+        remaining = total_segments
+        while remaining:
+            page = pages.get()
+            if page is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        # Unblock workers if the consumer stopped early or a segment failed
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel scan a DynamoDB table")
+    parser.add_argument("table", help="DynamoDB table name")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS,
+                        help="number of scan segments")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="thread pool size (default: one per segment)")
+    args = parser.parse_args()
+
+    segment_stats = []
+    started = time.monotonic()
+    count = sum(1 for _ in parallel_scan(args.table, args.segments, args.workers,
+                                         segment_stats=segment_stats))
+    elapsed = time.monotonic() - started
+    print(f"Scanned {count} items from {args.table} in {elapsed:.2f}s "
+          f"using {args.segments} segments")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Queue of per-user reminder jobs between discovery and delivery.
+
+The scheduled notification run only works out who needs a reminder and
+enqueues one job per user; delivery invocations pick the jobs up in
+batches and render and publish them. SqsReminderQueue is used in AWS,
+InMemoryReminderQueue for local runs and benchmarks.
+
+A job is a JSON message:
+
+    {"userId": ..., "reminderKey": ..., "events": [...], "digest": {...}}
+
+"digest" is only set by digest runs (DigestPlan.as_dict()). Events carry
+only the fields the emails show; a job that would be over the SQS message
+size limit has their details cut to a preview.
+"""
+
+import json
+import time
+import uuid
+import boto3
+from decimal import Decimal
+from event_record import EventRecord
+
+# SendMessageBatch accepts at most 10 entries per request, and SQS at most
+# 256 KiB per message and per request
+SEND_BATCH_SIZE = 10
+MAX_MESSAGE_BYTES = 256 * 1024
+# Characters of event details kept by jobs that would otherwise be too big
+DETAILS_PREVIEW_CHARS = 280
+SEND_MAX_RETRIES = 5
+SEND_BASE_DELAY = 0.05  # seconds, doubled on every retry
+
+
+class JobTooLarge(ValueError):
+    """A job over the SQS message size limit even with its details trimmed"""
+
+
+def encode_job(user_id, reminder_key, events, digest=None):
+    """
+    JSON body of a reminder job, within MAX_MESSAGE_BYTES.
+
+    Raises JobTooLarge if the user's events don't fit even with their
+    details cut to DETAILS_PREVIEW_CHARS.
+    """
+    job = {"userId": user_id, "reminderKey": reminder_key, "events": events}
+    if digest:
+        job["digest"] = digest
+    body = json.dumps(job, default=_json_default)
+    if len(body.encode()) <= MAX_MESSAGE_BYTES:
+        return body
+
+    job["events"] = [_with_details_preview(event) for event in events]
+    body = json.dumps(job, default=_json_default)
+    size = len(body.encode())
+    if size > MAX_MESSAGE_BYTES:
+        raise JobTooLarge(f"Reminder job for {user_id} is {size} bytes with {len(events)} events")
+    return body
+
+
+def job_batches(bodies):
+    """Split job bodies into SendMessageBatch requests within the count and size limits"""
+    batch, batch_bytes = [], 0
+    for body in bodies:
+        size = len(body.encode())
+        if batch and (len(batch) == SEND_BATCH_SIZE or batch_bytes + size > MAX_MESSAGE_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(body)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def decode_job(body):
+    """Return (user_id, reminder_key, events, digest) from a job message body"""
+    job = json.loads(body)
+    return job["userId"], job["reminderKey"], job["events"], job.get("digest")
+
+
+def _with_details_preview(event):
+    item = event.to_item() if isinstance(event, EventRecord) else dict(event)
+    details = item.get('details')
+    if isinstance(details, str) and len(details) > DETAILS_PREVIEW_CHARS:
+        item['details'] = details[:DETAILS_PREVIEW_CHARS] + "…"
+    return item
+
+
+def _json_default(obj):
+    if isinstance(obj, EventRecord):
+        return obj.to_item()
+    # DynamoDB numbers; reminder fields only hold whole numbers
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError
+
+
+class SqsReminderQueue:
+    """Reminder jobs on an SQS queue, consumed by the delivery Lambda"""
+
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self.client = client or boto3.client('sqs')
+
+    def send_batch(self, bodies):
+        """
+        Send up to 10 job bodies with one SendMessageBatch call, retrying
+        entries SQS rejects.
+
+        Returns:
+            List of error messages, one per job SQS still rejected: sender
+            faults (which won't succeed on retry) and entries still failing
+            after SEND_MAX_RETRIES retries
+        """
+        entries = {str(i): body for i, body in enumerate(bodies)}
+        errors = []
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            response = self.client.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': entry_id, 'MessageBody': body} for entry_id, body in entries.items()]
+            )
+            failed = response.get('Failed', [])
+            errors.extend(
+                f"{failure.get('Code')}: {failure.get('Message', '')}"
+                for failure in failed if failure.get('SenderFault')
+            )
+            entries = {failure['Id']: entries[failure['Id']] for failure in failed if not failure.get('SenderFault')}
+            if not entries:
+                return errors
+            if attempt < SEND_MAX_RETRIES:
+                time.sleep(SEND_BASE_DELAY * (2 ** attempt))
+        return errors + [f"Still rejected after {SEND_MAX_RETRIES} retries"] * len(entries)
+
+
+class InMemoryReminderQueue:
+    """Process-local reminder queue for tests, local runs and benchmarks"""
+
+    def __init__(self):
+        self.messages = []
+        self.send_calls = 0
+
+    def send_batch(self, bodies):
+        if len(bodies) > SEND_BATCH_SIZE:
+            raise ValueError(f"at most {SEND_BATCH_SIZE} messages per batch")
+        if sum(len(body.encode()) for body in bodies) > MAX_MESSAGE_BYTES:
+            raise ValueError(f"at most {MAX_MESSAGE_BYTES} bytes per batch")
+        self.send_calls += 1
+        self.messages.extend(bodies)
+        return []
+
+    def receive(self, max_messages=SEND_BATCH_SIZE):
+        """
+        Take up to max_messages jobs off the queue, shaped like the SQS event
+        the delivery Lambda receives.
+        """
+        bodies, self.messages = self.messages[:max_messages], self.messages[max_messages:]
+        return {
+            "Records": [
+                {"messageId": str(uuid.uuid4()), "eventSource": "aws:sqs", "body": body}
+                for body in bodies
+            ]
+        }
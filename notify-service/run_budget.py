@@ -0,0 +1,51 @@
+"""
+Remaining-time budget for a notification run.
+
+Instead of stopping at a fixed margin before the Lambda timeout, the run
+learns how long each user takes to handle (read, look up, render, publish)
+and stops as soon as the next chunk of users, plus the batches still in
+flight, would not fit in the time left before its reserve.
+"""
+
+# Assumed cost per user until the first chunk has been timed
+INITIAL_USER_MS = 20.0
+
+
+class RunBudget:
+    """
+    Time budget with a per-user cost estimate learned from observed latency.
+
+    Args:
+        remaining_ms: Callable returning the milliseconds left (e.g.
+            context.get_remaining_time_in_millis); None means no limit
+        reserve_ms: Time kept back for checkpointing and handing over
+        smoothing: Weight of the newest sample in the moving average
+    """
+
+    def __init__(self, remaining_ms, reserve_ms, smoothing=0.3):
+        self.remaining_ms = remaining_ms
+        self.reserve_ms = reserve_ms
+        self.smoothing = smoothing
+        self.user_ms = INITIAL_USER_MS
+        self.samples = 0
+
+    def record(self, users, seconds):
+        """Fold the time taken to handle `users` users into the estimate"""
+        if users <= 0:
+            return
+        sample = seconds * 1000.0 / users
+        if self.samples:
+            self.user_ms += self.smoothing * (sample - self.user_ms)
+        else:
+            self.user_ms = sample
+        self.samples += 1
+
+    def exhausted(self, upcoming_users):
+        """True if upcoming_users more users would eat into the reserve"""
+        if self.remaining_ms is None:
+            return False
+        return self.remaining_ms() - self.reserve_ms < self.user_ms * upcoming_users
+
+    def describe(self):
+        left = f"{self.remaining_ms()} ms left" if self.remaining_ms else "no time limit"
+        return f"~{self.user_ms:.1f} ms/user over {self.samples} chunks, {left}"
@@ -0,0 +1,45 @@
+"""
+Shared fixtures: notification.py wired to the in-memory stand-ins.
+
+    PYTHONPATH=auth-service/package python -m pytest notify-service/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import notification
+from checkpoint import InMemoryCheckpointStore
+from stand_ins import EventDataset, RecordingSNS, StandInDynamoClient, StandInDynamoResource, StandInTable, StubLambda
+
+TARGET_DATE = "2025-01-14"
+EVENT_COUNT = 3000
+# Several pages per run, so runs stop part way through the date index
+QUERY_PAGE_SIZE = 400
+
+
+@pytest.fixture
+def stand_ins(monkeypatch):
+    """(dataset, sns, lambda_client) behind a notification module with no ledger, queue or schedule"""
+    dataset = EventDataset(EVENT_COUNT, TARGET_DATE)
+    client = StandInDynamoClient(dataset, page_size=QUERY_PAGE_SIZE)
+    sns = RecordingSNS()
+    lambda_client = StubLambda()
+    monkeypatch.setattr(notification, "dynamodb", StandInDynamoResource(client))
+    monkeypatch.setattr(notification, "sns", sns)
+    monkeypatch.setattr(notification, "events_table", StandInTable("EventsTable", client))
+    monkeypatch.setattr(notification, "schedule_table", None)
+    monkeypatch.setattr(notification, "ledger", None)
+    monkeypatch.setattr(notification, "reminder_queue", None)
+    monkeypatch.setattr(notification, "lambda_client", lambda_client)
+    monkeypatch.setattr(notification, "checkpoint_store", InMemoryCheckpointStore())
+    monkeypatch.setattr(notification, "SNS_PUBLISH_RATE", 1e9)
+    monkeypatch.setattr(notification, "METRICS_LOCAL_FILE", "")
+    monkeypatch.setattr(notification.metrics, "sink", lambda line: None)
+    return dataset, sns, lambda_client
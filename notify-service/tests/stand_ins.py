@@ -0,0 +1,172 @@
+"""
+In-memory stand-ins for the AWS calls the notification Lambda makes.
+
+Only what the tests exercise is implemented, with the request and response
+shapes of the real APIs: date index queries (paged), BatchGetItem on the
+users table, SNS PublishBatch and Lambda self-invocation.
+"""
+
+import bisect
+import json
+import random
+from array import array
+
+from boto3.dynamodb.types import TypeDeserializer
+
+PUBLISH_BATCH_LIMIT = 10
+PUBLISH_BATCH_MAX_BYTES = 256 * 1024
+
+
+class EventDataset:
+    """
+    Events on one date for a few hundred users, sorted by user the way the
+    date index returns them. Only each event's user is stored; the rest is
+    derived from its position.
+    """
+
+    def __init__(self, event_count, date, user_count=None, seed=42):
+        rng = random.Random(seed)
+        self.date = date
+        user_count = user_count or max(1, event_count // 6)
+        self.users = array('I', sorted(rng.randrange(user_count) for _ in range(event_count)))
+
+    def __len__(self):
+        return len(self.users)
+
+    @staticmethod
+    def email(user):
+        return f"user{user:07d}@example.com"
+
+    def wire_item(self, position):
+        """Event at a position of the date index, in wire format"""
+        return {
+            'userId': {'S': self.email(self.users[position])},
+            'eventId': {'S': f"event-{position}"},
+            'title': {'S': f"Event #{position}"},
+            'date': {'S': self.date},
+            'time': {'S': f"{8 + position % 12:02d}:{(position % 4) * 15:02d}"},
+            'venue': {'S': "Not specified"},
+            'details': {'S': f"Test event {position}."}
+        }
+
+
+class StandInDynamoClient:
+    """Low-level DynamoDB client answering date index queries a page at a time"""
+
+    def __init__(self, dataset, page_size=400):
+        self.dataset = dataset
+        self.page_size = page_size
+
+    def query(self, TableName, ExpressionAttributeValues, ExclusiveStartKey=None, Limit=None, **kwargs):
+        if ExpressionAttributeValues.get(':date', {}).get('S') != self.dataset.date:
+            return {'Items': [], 'Count': 0, 'ScannedCount': 0}
+        if ExclusiveStartKey:
+            start = int(ExclusiveStartKey['position']['N'])
+        elif ':after' in ExpressionAttributeValues:
+            # Digest runs resume after a user: "userId > :after"
+            after = ExpressionAttributeValues[':after']['S']
+            start = bisect.bisect_right(self.dataset.users, int(after[4:11]))
+        else:
+            start = 0
+        end = min(start + (Limit or self.page_size), len(self.dataset))
+        items = [self.dataset.wire_item(position) for position in range(start, end)]
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+        if end < len(self.dataset):
+            response['LastEvaluatedKey'] = {'position': {'N': str(end)}}
+        return response
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class StandInTable:
+    """Just enough of a boto3 Table for query_pages (name and meta.client)"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.meta = _Meta(client)
+
+
+class StandInDynamoResource:
+    """boto3 DynamoDB resource: BatchGetItem on the users table"""
+
+    def __init__(self, client):
+        self.meta = _Meta(client)
+
+    def batch_get_item(self, RequestItems):
+        return {
+            'Responses': {
+                table: [{'email': key['email'], 'full_name': "Test User"} for key in request['Keys']]
+                for table, request in RequestItems.items()
+            },
+            'UnprocessedKeys': {}
+        }
+
+
+class RecordingSNS:
+    """
+    SNS client that remembers who every message went to and what kind it
+    was. Entries for users in `failing` are rejected, as SNS reports a
+    failed entry of a PublishBatch call.
+    """
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.delivered = []
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        if len(PublishBatchRequestEntries) > PUBLISH_BATCH_LIMIT:
+            raise ValueError("Too many entries in the PublishBatch call")
+        if sum(len(entry['Message'].encode()) for entry in PublishBatchRequestEntries) > PUBLISH_BATCH_MAX_BYTES:
+            raise ValueError("Total size of the PublishBatch request exceeds 262144 bytes")
+        successful, failed = [], []
+        for entry in PublishBatchRequestEntries:
+            attributes = entry['MessageAttributes']
+            user = attributes['user_email']['StringValue']
+            if user in self.failing:
+                failed.append({'Id': entry['Id'], 'Code': "InternalError", 'SenderFault': False})
+                continue
+            kind = "digest" if 'digest_days' in attributes else "reminder"
+            self.delivered.append((user, kind))
+            successful.append({'Id': entry['Id'], 'MessageId': entry['Id']})
+        return {'Successful': successful, 'Failed': failed}
+
+
+class StubLambda:
+    """Records the self-invocations a run hands its remainder to"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.payloads.append(json.loads(Payload))
+
+
+class ExpiringContext:
+    """Lambda context whose remaining time runs out after a few budget checks"""
+
+    function_name = "notification"
+
+    def __init__(self, request_id, checks=2):
+        self.aws_request_id = request_id
+        self.checks = checks
+
+    def get_remaining_time_in_millis(self):
+        self.checks -= 1
+        return 60000 if self.checks > 0 else 0
+
+
+def scan_stand_in(dataset):
+    """parallel_scan over the dataset, items arriving in no particular order"""
+    deserializer = TypeDeserializer()
+
+    def parallel_scan(table_name, total_segments=4, segment_stats=None, **scan_kwargs):
+        positions = list(range(len(dataset)))
+        random.Random(7).shuffle(positions)
+        for position in positions:
+            yield {key: deserializer.deserialize(value) for key, value in dataset.wire_item(position).items()}
+        if segment_stats is not None:
+            segment_stats.append({"scanned": len(dataset), "capacity_units": 0.0, "seconds": 0.0, "pages": 1})
+    return parallel_scan
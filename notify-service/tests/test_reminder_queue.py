@@ -0,0 +1,61 @@
+"""
+Queue mode: the scheduled run enqueues one job per user, and the delivery
+Lambda renders and publishes them, reporting failed jobs back to SQS.
+"""
+
+import contextlib
+import io
+import json
+from collections import Counter
+
+import pytest
+
+import notification
+from reminder_queue import InMemoryReminderQueue, decode_job
+from stand_ins import ExpiringContext
+
+RUN_TIME = "2025-01-13T08:00:00Z"  # a Monday, so weekly digests are due
+
+
+def deliver(queue):
+    """Feed every queued job to delivery_handler in SQS-sized batches; return the failed records"""
+    failed = []
+    while queue.messages:
+        batch = queue.receive()
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = notification.delivery_handler(batch, None)
+        failed_ids = {failure["itemIdentifier"] for failure in response["batchItemFailures"]}
+        failed.extend(record for record in batch["Records"] if record["messageId"] in failed_ids)
+    return failed
+
+
+@pytest.mark.parametrize("digest_days", [0, 7])
+def test_queued_jobs_are_delivered_once_and_failures_reported(stand_ins, monkeypatch, digest_days):
+    dataset, sns, lambda_client = stand_ins
+    queue = InMemoryReminderQueue()
+    monkeypatch.setattr(notification, "reminder_queue", queue)
+    monkeypatch.setattr(notification, "DIGEST_DAYS", digest_days)
+    users = sorted({dataset.email(user) for user in dataset.users})
+    unlucky = users[len(users) // 2]
+    sns.failing.add(unlucky)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = notification.lambda_handler({"time": RUN_TIME}, ExpiringContext("request-1", checks=10 ** 6))
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["reminders_queued"] == len(users)
+    assert sns.delivered == []
+
+    failed = deliver(queue)
+
+    # Only the job SNS rejected comes back, for SQS to redeliver
+    assert [decode_job(record["body"])[0] for record in failed] == [unlucky]
+    kinds = ["reminder", "digest"] if digest_days else ["reminder"]
+    delivered = Counter(sns.delivered)
+    assert set(delivered) == {(user, kind) for user in users if user != unlucky for kind in kinds}
+    assert set(delivered.values()) == {1}
+
+    sns.failing.clear()
+    queue.messages.extend(record["body"] for record in failed)
+    assert deliver(queue) == []
+    assert Counter(sns.delivered) == Counter({(user, kind): 1 for user in users for kind in kinds})
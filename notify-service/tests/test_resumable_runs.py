@@ -0,0 +1,88 @@
+"""
+Resumable notification runs, end to end against in-memory AWS stand-ins.
+
+Each run is cut short by a context whose remaining time runs out, and
+continued from its checkpoint the way the re-invoked Lambda would be, until
+it completes:
+
+    PYTHONPATH=auth-service/package python -m pytest notify-service/tests
+"""
+
+import contextlib
+import io
+import json
+from collections import Counter
+
+import pytest
+
+import notification
+from conftest import EVENT_COUNT, QUERY_PAGE_SIZE
+from stand_ins import ExpiringContext, scan_stand_in
+
+RUN_TIME = "2025-01-13T08:00:00Z"  # a Monday, so weekly digests are due
+
+
+def run_to_completion(lambda_client):
+    """Invoke the handler, then every continuation it asks for; return the responses"""
+    responses = []
+    event, invocation = {"time": RUN_TIME}, 0
+    while event is not None:
+        invocation += 1
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = notification.lambda_handler(event, ExpiringContext(f"request-{invocation}"))
+        responses.append(response)
+        assert response["statusCode"] in (200, 202), response
+        if response["statusCode"] == 202:
+            assert len(lambda_client.payloads) == invocation
+            event = lambda_client.payloads[-1]
+            # Checkpoints hold one page of users at most, never the whole run
+            checkpoint = notification.checkpoint_store.checkpoints[event["resume_run_id"]]
+            assert len(json.loads(checkpoint)["notified"]) <= QUERY_PAGE_SIZE + 1
+        else:
+            event = None
+    return responses
+
+
+@pytest.mark.parametrize("read_mode", ["index", "scan"])
+@pytest.mark.parametrize("digest_days", [0, 7])
+def test_every_user_notified_once_across_invocations(stand_ins, monkeypatch, read_mode, digest_days):
+    dataset, sns, lambda_client = stand_ins
+    monkeypatch.setattr(notification, "DIGEST_DAYS", digest_days)
+    if read_mode == "scan":
+        monkeypatch.setattr(notification, "EVENTS_DATE_INDEX", "")
+        monkeypatch.setattr(notification, "parallel_scan", scan_stand_in(dataset))
+
+    responses = run_to_completion(lambda_client)
+
+    assert len(responses) > 2, "the run should have been continued more than once"
+    users = {dataset.email(user) for user in dataset.users}
+    kinds = ["reminder", "digest"] if digest_days else ["reminder"]
+    delivered = Counter(sns.delivered)
+    assert set(delivered) == {(user, kind) for user in users for kind in kinds}
+    assert set(delivered.values()) == {1}
+
+    summary = json.loads(responses[-1]["body"])
+    assert summary["notifications_sent"] == len(users) * len(kinds)
+    # Rows read again after a resume are only counted once
+    assert summary["total_events"] == EVENT_COUNT
+    assert summary["tomorrow_events"] == EVENT_COUNT
+
+
+def test_unknown_run_is_not_started_over(stand_ins):
+    dataset, sns, lambda_client = stand_ins
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = notification.lambda_handler({"resume_run_id": "missing"}, ExpiringContext("request-1"))
+
+    assert response["statusCode"] == 404
+    assert sns.delivered == [] and lambda_client.payloads == []
+
+
+def test_runs_without_checkpoint_table_are_not_continued(stand_ins, monkeypatch):
+    dataset, sns, lambda_client = stand_ins
+    monkeypatch.setattr(notification, "checkpoint_store", None)
+
+    responses = run_to_completion(lambda_client)
+
+    assert len(responses) == 1 and lambda_client.payloads == []
+    users = {dataset.email(user) for user in dataset.users}
+    assert sorted(user for user, kind in sns.delivered if kind == "reminder") == sorted(users)
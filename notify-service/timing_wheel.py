@@ -0,0 +1,144 @@
+"""
+Hierarchical timing wheel for the long-running notification worker.
+
+Timers live in a stack of wheels, each `wheel_size` slots wide. Level 0
+slots are one tick apart; each slot of level n covers a whole rotation of
+level n-1. A timer goes on the lowest level whose rotation contains its
+deadline, and drops down a level ("cascades") each time that level's slot
+comes round, until it fires from level 0. Deadlines beyond the top wheel
+wait in an overflow slot that is cascaded once per top-level rotation.
+
+Insert and cancel are O(1): timers are kept in per-slot dicts and indexed
+by key, so cancelling never searches a slot.
+"""
+
+import math
+
+
+class _Timer:
+    __slots__ = ('key', 'deadline', 'payload', 'level', 'slot')
+
+    def __init__(self, key, deadline, payload):
+        self.key = key
+        self.deadline = deadline
+        self.payload = payload
+        self.level = None
+        self.slot = None
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel keyed by caller-chosen timer keys.
+
+    Not thread-safe; callers sharing a wheel between threads must lock.
+
+    Args:
+        tick_seconds: Resolution of the wheel
+        wheel_size: Slots per level (rounded up to a power of two)
+        levels: Number of levels; together they span
+            tick_seconds * wheel_size ** levels seconds
+        now: Epoch seconds the wheel starts at
+    """
+
+    def __init__(self, tick_seconds=0.1, wheel_size=64, levels=4, now=0.0):
+        if tick_seconds <= 0:
+            raise ValueError("tick_seconds must be positive")
+        self.tick_seconds = float(tick_seconds)
+        self.bits = max(1, math.ceil(math.log2(wheel_size)))
+        self.mask = (1 << self.bits) - 1
+        self.levels = levels
+        self.current = self._tick(now)
+        self.slots = [[{} for _ in range(self.mask + 1)] for _ in range(levels)]
+        self.overflow = {}
+        self.expired = {}  # scheduled in the past, fired on the next advance()
+        self.timers = {}
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def _tick(self, when):
+        return int(math.floor(when / self.tick_seconds))
+
+    def _place(self, timer):
+        deadline = timer.deadline
+        if deadline <= self.current:
+            timer.level, timer.slot = None, None
+            self.expired[timer.key] = timer
+            return
+        for level in range(self.levels):
+            # Lowest level whose current rotation contains the deadline
+            shift = self.bits * (level + 1)
+            if deadline >> shift == self.current >> shift:
+                timer.level = level
+                timer.slot = (deadline >> (self.bits * level)) & self.mask
+                self.slots[level][timer.slot][timer.key] = timer
+                return
+        timer.level, timer.slot = self.levels, None
+        self.overflow[timer.key] = timer
+
+    def _bucket(self, timer):
+        if timer.level is None:
+            return self.expired
+        if timer.level == self.levels:
+            return self.overflow
+        return self.slots[timer.level][timer.slot]
+
+    def schedule(self, key, when, payload=None):
+        """Add a timer firing at epoch seconds `when`, replacing any timer with the same key"""
+        self.cancel(key)
+        # Round up so a timer never fires before its deadline
+        timer = _Timer(key, int(math.ceil(when / self.tick_seconds)), payload)
+        self.timers[key] = timer
+        self._place(timer)
+
+    def cancel(self, key):
+        """Remove a pending timer; returns False if there was none"""
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return False
+        del self._bucket(timer)[key]
+        return True
+
+    def _cascade(self, bucket):
+        timers = list(bucket.values())
+        bucket.clear()
+        for timer in timers:
+            self._place(timer)
+
+    def advance(self, now):
+        """
+        Move the wheel forward to epoch seconds `now`.
+
+        Returns:
+            List of (key, payload) for every timer that came due, in
+            deadline order
+        """
+        fired = []
+        if self.expired:
+            fired.extend(self._pop(self.expired))
+
+        target = self._tick(now)
+        while self.current < target:
+            self.current += 1
+            tick = self.current
+            if tick & ((1 << (self.bits * self.levels)) - 1) == 0:
+                self._cascade(self.overflow)
+            for level in range(self.levels - 1, 0, -1):
+                if tick & ((1 << (self.bits * level)) - 1) == 0:
+                    self._cascade(self.slots[level][(tick >> (self.bits * level)) & self.mask])
+            # Cascading lands timers due right now in expired
+            fired.extend(self._pop(self.expired))
+            fired.extend(self._pop(self.slots[0][tick & self.mask]))
+        return fired
+
+    def _pop(self, bucket):
+        if not bucket:
+            return []
+        timers = sorted(bucket.values(), key=lambda timer: timer.deadline)
+        bucket.clear()
+        for timer in timers:
+            del self.timers[timer.key]
+        return [(timer.key, timer.payload) for timer in timers]
@@ -0,0 +1,265 @@
+"""
+Long-running notification worker for the container deployment.
+
+Instead of a per-minute Lambda, the worker keeps the next
+WORKER_LOOKAHEAD_MINUTES of the reminder schedule in a timing wheel and
+fires each reminder as its minute starts:
+
+    python worker.py
+
+The wheel is filled one minute bucket at a time, so the worker reads each
+schedule partition once (the same queries the Lambda makes) and never
+scans. Changes the events service makes to the schedule table (new, moved
+or deleted reminders) reach the wheel through the table's DynamoDB stream.
+Delivery reuses notification.publish_reminders, so the dedupe ledger keeps
+the worker and the Lambda, or several worker replicas, from sending a
+reminder twice.
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from boto3.dynamodb.types import TypeDeserializer
+import boto3
+import notification
+from timing_wheel import TimingWheel
+
+WORKER_TICK_SECONDS = float(os.environ.get("WORKER_TICK_SECONDS", "0.1"))
+WORKER_LOOKAHEAD_MINUTES = int(os.environ.get("WORKER_LOOKAHEAD_MINUTES", "60"))
+# Comma-separated schedule shards this replica owns (default: all of them)
+WORKER_SHARDS = os.environ.get("WORKER_SHARDS", "")
+# Stream of the reminder schedule table; looked up from the table if unset
+REMINDER_STREAM_ARN = os.environ.get("REMINDER_STREAM_ARN", "")
+STREAM_POLL_SECONDS = float(os.environ.get("STREAM_POLL_SECONDS", "1"))
+# How often the stream follower looks for new (split) shards
+STREAM_SHARD_REFRESH_SECONDS = 60
+
+BUCKET_FORMAT = "%Y-%m-%dT%H:%M"
+
+deserializer = TypeDeserializer()
+
+
+def bucket_time(window):
+    """Epoch seconds of a minute bucket (YYYY-MM-DDTHH:MM, UTC)"""
+    return datetime.strptime(window, BUCKET_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+def from_wire(image):
+    """Convert a stream image from DynamoDB wire format to a plain item"""
+    return {key: deserializer.deserialize(value) for key, value in image.items()}
+
+
+class StreamFollower:
+    """
+    Polls every shard of a DynamoDB stream and passes records to a handler.
+
+    Shards open when the follower starts are read from their latest record;
+    shards that appear later (after a split) are read from the start.
+    """
+
+    def __init__(self, stream_arn, handler, client=None, poll_seconds=STREAM_POLL_SECONDS):
+        self.stream_arn = stream_arn
+        self.handler = handler
+        self.client = client or boto3.client('dynamodbstreams')
+        self.poll_seconds = poll_seconds
+        self.iterators = {}
+        self.finished = set()
+
+    def refresh_shards(self, iterator_type):
+        kwargs = {'StreamArn': self.stream_arn}
+        while True:
+            description = self.client.describe_stream(**kwargs)['StreamDescription']
+            for shard in description.get('Shards', []):
+                shard_id = shard['ShardId']
+                if shard_id in self.iterators or shard_id in self.finished:
+                    continue
+                closed = 'EndingSequenceNumber' in shard['SequenceNumberRange']
+                if closed and iterator_type == 'LATEST':
+                    self.finished.add(shard_id)
+                    continue
+                self.iterators[shard_id] = self.client.get_shard_iterator(
+                    StreamArn=self.stream_arn,
+                    ShardId=shard_id,
+                    ShardIteratorType=iterator_type
+                )['ShardIterator']
+            if 'LastEvaluatedShardId' not in description:
+                break
+            kwargs['ExclusiveStartShardId'] = description['LastEvaluatedShardId']
+
+    def poll(self):
+        """Read one batch from every open shard"""
+        for shard_id, iterator in list(self.iterators.items()):
+            response = self.client.get_records(ShardIterator=iterator)
+            for record in response.get('Records', []):
+                self.handler(record)
+            next_iterator = response.get('NextShardIterator')
+            if next_iterator:
+                self.iterators[shard_id] = next_iterator
+            else:
+                # Shard closed and fully read
+                del self.iterators[shard_id]
+                self.finished.add(shard_id)
+
+    def run(self, stop):
+        self.refresh_shards('LATEST')
+        refreshed = time.monotonic()
+        while not stop.is_set():
+            try:
+                if time.monotonic() - refreshed > STREAM_SHARD_REFRESH_SECONDS:
+                    self.refresh_shards('TRIM_HORIZON')
+                    refreshed = time.monotonic()
+                self.poll()
+            except Exception as e:
+                print(f"Error reading reminder stream: {str(e)}")
+            stop.wait(self.poll_seconds)
+
+
+class ReminderWorker:
+    """
+    Loads upcoming reminders into a timing wheel and publishes them when due.
+
+    Args:
+        schedule_table: Reminder schedule Table
+        shards: Schedule shards to load and follow
+        wheel: TimingWheel to use (a new one by default)
+        lookahead_minutes: How far ahead reminders are held in the wheel
+        publish: Callable(user_groups, reminder_key) delivering reminders;
+            defaults to notification.publish_reminders
+    """
+
+    def __init__(self, schedule_table, shards, wheel=None,
+                 lookahead_minutes=WORKER_LOOKAHEAD_MINUTES, publish=None):
+        self.schedule_table = schedule_table
+        self.shards = list(shards)
+        self.lookahead = timedelta(minutes=lookahead_minutes)
+        self.wheel = wheel or TimingWheel(WORKER_TICK_SECONDS, now=time.time())
+        self.publish = publish or notification.publish_reminders
+        self.lock = threading.Lock()
+        self.deliveries = queue.Queue()
+        self.loaded_until = None  # first minute not yet loaded into the wheel
+
+    def owns(self, bucket):
+        shard = bucket.rpartition('#')[2]
+        return shard.isdigit() and int(shard) in self.shards
+
+    def add(self, row):
+        window = row['bucket'].partition('#')[0]
+        with self.lock:
+            self.wheel.schedule((row['bucket'], row['reminderId']), bucket_time(window), row)
+
+    def remove(self, key):
+        with self.lock:
+            self.wheel.cancel((key['bucket'], key['reminderId']))
+
+    def load_minute(self, minute):
+        """Put every reminder due in one minute bucket on the wheel"""
+        window = minute.strftime(BUCKET_FORMAT)
+        stats = {"total_events": 0, "date_events": 0, "consumed_read_units": 0.0}
+        for shard in self.shards:
+            kwargs = {
+                'KeyConditionExpression': '#bk = :bucket',
+                'ExpressionAttributeNames': {'#bk': 'bucket'},
+                'ExpressionAttributeValues': {':bucket': {'S': f"{window}#{shard}"}},
+                'ReturnConsumedCapacity': 'TOTAL'
+            }
+            source = {'source': 'schedule', 'shard': shard}
+            for _, row in notification.query_pages(self.schedule_table, stats, kwargs, source,
+                                                   convert=from_wire):
+                self.add(row)
+        return stats["total_events"]
+
+    def fill(self, now):
+        """Load minute buckets until the wheel covers the lookahead window"""
+        horizon = now + self.lookahead
+        if self.loaded_until is None:
+            self.loaded_until = now.replace(second=0, microsecond=0)
+        while self.loaded_until <= horizon:
+            self.load_minute(self.loaded_until)
+            self.loaded_until += timedelta(minutes=1)
+
+    def apply_change(self, record):
+        """Apply one stream record from the schedule table to the wheel"""
+        change = record.get('dynamodb', {})
+        key = from_wire(change.get('Keys', {}))
+        if not key or not self.owns(key['bucket']):
+            return
+        if record.get('eventName') == 'REMOVE':
+            self.remove(key)
+            return
+        # Rows past the loaded window are picked up when their minute is loaded
+        due = datetime.fromtimestamp(bucket_time(key['bucket'].partition('#')[0]), timezone.utc)
+        if self.loaded_until and due < self.loaded_until:
+            self.add(from_wire(change.get('NewImage', {})))
+
+    def tick(self, now=None):
+        """Fire due timers, grouping each minute's reminders by user for delivery"""
+        with self.lock:
+            fired = self.wheel.advance(now if now is not None else time.time())
+        windows = {}
+        for _, row in fired:
+            window = row['bucket'].partition('#')[0]
+            windows.setdefault(window, {}).setdefault(row['userId'], []).append(row)
+        for window, users in sorted(windows.items()):
+            self.deliveries.put((window, users))
+        return len(fired)
+
+    def deliver_forever(self, stop):
+        while not stop.is_set():
+            try:
+                window, users = self.deliveries.get(timeout=1)
+            except queue.Empty:
+                continue
+            metrics = notification.metrics
+            try:
+                sent, skipped, errors, _ = self.publish(list(users.items()), window)
+                print(f"Window {window}: {sent} sent, {skipped} already sent, {errors} errors")
+                metrics.add("NotificationsSent", sent)
+                metrics.add("AlreadySent", skipped)
+                metrics.add("Errors", errors)
+            except Exception as e:
+                print(f"Error delivering reminders for {window}: {str(e)}")
+                metrics.add("RunFailures", 1)
+            # One EMF line per delivered window
+            metrics.set_dimension("RunType", "worker")
+            metrics.set_property("Target", window)
+            metrics.flush()
+
+    def run(self, stream_follower=None, stop=None):
+        stop = stop or threading.Event()
+        threads = [threading.Thread(target=self.deliver_forever, args=(stop,), daemon=True)]
+        if stream_follower:
+            # Follow changes before the first load so none are missed
+            threads.append(threading.Thread(target=stream_follower.run, args=(stop,), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        self.fill(datetime.now(timezone.utc))
+        print(f"Loaded {len(self.wheel)} reminders for the next {self.lookahead}")
+        while not stop.is_set():
+            self.tick()
+            if datetime.now(timezone.utc) + self.lookahead >= self.loaded_until:
+                self.fill(datetime.now(timezone.utc))
+            stop.wait(WORKER_TICK_SECONDS)
+
+
+def main():
+    if not notification.schedule_table:
+        raise SystemExit("REMINDER_SCHEDULE_TABLE must be set to run the worker")
+
+    shards = ([int(shard) for shard in WORKER_SHARDS.split(',') if shard.strip()]
+              or range(notification.REMINDER_SHARDS))
+    worker = ReminderWorker(notification.schedule_table, shards)
+
+    stream_arn = REMINDER_STREAM_ARN or notification.schedule_table.latest_stream_arn
+    follower = StreamFollower(stream_arn, worker.apply_change) if stream_arn else None
+    if not follower:
+        print("Warning: no stream on the reminder schedule table, changes load with their minute")
+
+    print(f"Notification worker starting (shards {list(shards)}, tick {WORKER_TICK_SECONDS}s)")
+    worker.run(follower)
+
+
+if __name__ == "__main__":
+    main()
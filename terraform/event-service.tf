@@ -19,6 +19,70 @@ resource "aws_dynamodb_table" "events_table" {
     type = "S"
   }
 
+  attribute {
+    name = "date"
+    type = "S"
+  }
+
+  # Lets the notification service read a single day's events.
+  # Sorted by userId so each user's events come back together; only the
+  # attributes used by the reminder email are projected.
+  global_secondary_index {
+    name               = "DateIndex"
+    hash_key           = "date"
+    range_key          = "userId"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["title", "time", "venue", "details"]
+  }
+
+  # A user's events sorted by date, for GET /events?from=&to=&order=.
+  # A global index (unlike a local one) can be added to the existing table
+  # in place; it is eventually consistent, so a just-saved event can take
+  # a moment to show up in date listings.
+  global_secondary_index {
+    name            = "UserDateIndex"
+    hash_key        = "userId"
+    range_key       = "date"
+    projection_type = "ALL"
+  }
+
+  # Change feed for stream_consumer.py (derived schedule rows and counters)
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
+  tags = {
+    Project = "events-planner-end-to-end"
+  }
+}
+
+# Reminder schedule: one row per upcoming reminder, keyed by the UTC minute
+# it is sent ("YYYY-MM-DDTHH:MM#shard"). Maintained by the events Lambda and
+# read by the notification Lambda, which runs every minute.
+resource "aws_dynamodb_table" "reminder_schedule_table" {
+  name         = "ReminderScheduleTable"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "bucket"
+  range_key    = "reminderId"
+
+  attribute {
+    name = "bucket"
+    type = "S"
+  }
+
+  attribute {
+    name = "reminderId"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  # Change feed for the long-running notify worker (notify-service/worker.py)
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   tags = {
     Project = "events-planner-end-to-end"
   }
@@ -48,6 +112,27 @@ data "aws_iam_policy_document" "events_lambda_policy_doc" {
       "${aws_dynamodb_table.events_table.arn}/*"
     ]
   }
+
+  # User timezone decides which hour a reminder is scheduled for
+  statement {
+    actions   = ["dynamodb:GetItem"]
+    resources = [aws_dynamodb_table.users_table.arn]
+  }
+
+  # Event counters maintained by the stream consumer
+  statement {
+    actions   = ["dynamodb:Query"]
+    resources = [aws_dynamodb_table.event_stats_table.arn]
+  }
+
+  # Reminder rows are written in the same transaction as the event
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+      "dynamodb:DeleteItem"
+    ]
+    resources = [aws_dynamodb_table.reminder_schedule_table.arn]
+  }
 }
 
 resource "aws_iam_role_policy" "events_lambda_policy" {
@@ -67,8 +152,17 @@ resource "aws_lambda_function" "events_lambda" {
 
   environment {
     variables = {
-      JWT_SECRET   = "mysecretkey" # replace with secure secret / use var
-      EVENTS_TABLE = aws_dynamodb_table.events_table.name
+      JWT_SECRET              = "mysecretkey" # replace with secure secret / use var
+      EVENTS_TABLE            = aws_dynamodb_table.events_table.name
+      EVENTS_USER_DATE_INDEX  = "UserDateIndex"
+      USERS_TABLE             = aws_dynamodb_table.users_table.name
+      REMINDER_SCHEDULE_TABLE = aws_dynamodb_table.reminder_schedule_table.name
+      REMINDER_SHARDS         = "4"
+      REMINDER_LOCAL_HOUR     = "8" # users' local time, the day before the event
+      EVENT_STATS_TABLE       = aws_dynamodb_table.event_stats_table.name
+      LOG_LEVEL               = "INFO"
+      REQUEST_LOG_SAMPLE_RATE = "0.01" # share of requests logged in full (redacted)
+      JWT_CACHE_SIZE          = "1024" # verified tokens kept per warm container
     }
   }
 
@@ -0,0 +1,173 @@
+# terraform/event-stream-consumer.tf
+
+########################################
+# Event Stats Table (maintained from the EventsTable stream)
+########################################
+
+resource "aws_dynamodb_table" "event_stats_table" {
+  name         = "EventStatsTable"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "userId"
+  range_key    = "statKey"
+
+  attribute {
+    name = "userId"
+    type = "S"
+  }
+
+  attribute {
+    name = "statKey"
+    type = "S"
+  }
+
+  # Replay markers ("seq#<eventId>") expire once the stream can't replay them
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Project = "events-planner-end-to-end"
+  }
+}
+
+########################################
+# Stream Consumer Lambda
+########################################
+
+resource "aws_lambda_function" "event_stream_consumer" {
+  function_name = "events-stream-consumer"
+  filename      = "../event-service/events.zip"
+  handler       = "stream_consumer.lambda_handler"
+  runtime       = "python3.9"
+  role          = aws_iam_role.event_stream_consumer_role.arn
+  timeout       = 60
+  memory_size   = 256
+
+  environment {
+    variables = {
+      EVENT_STATS_TABLE       = aws_dynamodb_table.event_stats_table.name
+      USERS_TABLE             = aws_dynamodb_table.users_table.name
+      REMINDER_SCHEDULE_TABLE = aws_dynamodb_table.reminder_schedule_table.name
+      REMINDER_SHARDS         = "4" # must match the events Lambda
+      REMINDER_LOCAL_HOUR     = "8"
+    }
+  }
+
+  depends_on = [aws_iam_role_policy.event_stream_consumer_policy]
+
+  tags = {
+    Project = var.project_name
+    Service = "events"
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "events_stream" {
+  event_source_arn  = aws_dynamodb_table.events_table.stream_arn
+  function_name     = aws_lambda_function.event_stream_consumer.arn
+  starting_position = "TRIM_HORIZON"
+
+  # Bigger batches mean fewer, larger counter transactions
+  batch_size                         = 500
+  maximum_batching_window_in_seconds = 1
+
+  # Split a failing batch to isolate the bad record; everything the
+  # consumer writes is safe to apply twice
+  bisect_batch_on_function_error = true
+  maximum_retry_attempts         = 10
+}
+
+########################################
+# Alarm when the consumer falls behind
+########################################
+
+resource "aws_cloudwatch_metric_alarm" "events_stream_iterator_age" {
+  alarm_name          = "events-stream-consumer-iterator-age"
+  alarm_description   = "EventsTable stream consumer is more than 5 minutes behind"
+  namespace           = "AWS/Lambda"
+  metric_name         = "IteratorAge"
+  dimensions          = { FunctionName = aws_lambda_function.event_stream_consumer.function_name }
+  statistic           = "Maximum"
+  period              = 60
+  evaluation_periods  = 5
+  threshold           = 300000 # milliseconds
+  comparison_operator = "GreaterThanThreshold"
+  treat_missing_data  = "notBreaching"
+}
+
+########################################
+# IAM Role for Stream Consumer
+########################################
+
+resource "aws_iam_role" "event_stream_consumer_role" {
+  name = "${var.project_name}-event-stream-consumer-role"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect = "Allow"
+      Principal = {
+        Service = "lambda.amazonaws.com"
+      }
+      Action = "sts:AssumeRole"
+    }]
+  })
+}
+
+resource "aws_iam_role_policy" "event_stream_consumer_policy" {
+  name = "${var.project_name}-event-stream-consumer-policy"
+  role = aws_iam_role.event_stream_consumer_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      # CloudWatch Logs
+      {
+        Effect = "Allow"
+        Action = [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents"
+        ]
+        Resource = "arn:aws:logs:*:*:*"
+      },
+      # DynamoDB Streams - Read event changes
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = aws_dynamodb_table.events_table.stream_arn
+      },
+      # DynamoDB - Counters and replay markers
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:UpdateItem"
+        ]
+        Resource = aws_dynamodb_table.event_stats_table.arn
+      },
+      # DynamoDB - Reminder schedule rows
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchWriteItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = aws_dynamodb_table.reminder_schedule_table.arn
+      },
+      # DynamoDB - User timezones for reminder times
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem"
+        ]
+        Resource = aws_dynamodb_table.users_table.arn
+      }
+    ]
+  })
+}
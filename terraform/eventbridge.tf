@@ -1,17 +1,19 @@
 # terraform/eventbridge.tf
 
 ########################################
-# EventBridge Rule - Daily at 8 AM UTC
+# EventBridge Rule - Every Minute
 ########################################
 
-resource "aws_cloudwatch_event_rule" "daily_notification_check" {
-  name                = "daily-event-notification-check"
-  description         = "Triggers notification Lambda daily at 8 AM UTC"
+resource "aws_cloudwatch_event_rule" "minutely_notification_check" {
+  name                = "minutely-event-notification-check"
+  description         = "Triggers notification Lambda every minute"
   
   # Cron expression: minute hour day month dayofweek year
-  # "0 8 * * ? *" = Every day at 8:00 AM UTC
-  # UTC 8 AM = 1:30 PM IST (India Standard Time)
-  schedule_expression = "cron(0 8 * * ? *)"
+  # "* * * * ? *" = Every minute (UTC)
+  # Each run only reads the reminder schedule bucket for that minute: the
+  # day-before reminders at the users' local REMINDER_LOCAL_HOUR and any
+  # per-event reminder offsets (e.g. 1 hour or 15 minutes before)
+  schedule_expression = "cron(* * * * ? *)"
 
   tags = {
     Project = var.project_name
@@ -24,7 +26,7 @@ resource "aws_cloudwatch_event_rule" "daily_notification_check" {
 ########################################
 
 resource "aws_cloudwatch_event_target" "notification_lambda_target" {
-  rule      = aws_cloudwatch_event_rule.daily_notification_check.name
+  rule      = aws_cloudwatch_event_rule.minutely_notification_check.name
   target_id = "NotificationLambdaTarget"
   arn       = aws_lambda_function.notification_lambda.arn
 }
@@ -38,7 +40,40 @@ resource "aws_lambda_permission" "eventbridge_permission" {
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.notification_lambda.function_name
   principal     = "events.amazonaws.com"
-  source_arn    = aws_cloudwatch_event_rule.daily_notification_check.arn
+  source_arn    = aws_cloudwatch_event_rule.minutely_notification_check.arn
+}
+
+########################################
+# EventBridge Rule - Daily Digest
+########################################
+
+# The minutely runs only read the reminder schedule, so "your next 7 days"
+# digests come from their own daily run, which reads the coming days from
+# the date index in one pass (DIGEST_DAYS on the notification Lambda)
+resource "aws_cloudwatch_event_rule" "daily_digest" {
+  name                = "daily-event-digest"
+  description         = "Triggers the notification Lambda's digest run once a day"
+  schedule_expression = "cron(0 8 * * ? *)" # DAILY_REMINDER_HOUR UTC
+
+  tags = {
+    Project = var.project_name
+    Service = "notifications"
+  }
+}
+
+resource "aws_cloudwatch_event_target" "digest_lambda_target" {
+  rule      = aws_cloudwatch_event_rule.daily_digest.name
+  target_id = "NotificationLambdaDigestTarget"
+  arn       = aws_lambda_function.notification_lambda.arn
+  input     = jsonencode({ digest = true })
+}
+
+resource "aws_lambda_permission" "eventbridge_digest_permission" {
+  statement_id  = "AllowEventBridgeInvokeDigest"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.notification_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.daily_digest.arn
 }
 
 ########################################
@@ -46,11 +81,11 @@ resource "aws_lambda_permission" "eventbridge_permission" {
 ########################################
 
 output "eventbridge_rule_name" {
-  value       = aws_cloudwatch_event_rule.daily_notification_check.name
-  description = "Name of EventBridge rule for daily notifications"
+  value       = aws_cloudwatch_event_rule.minutely_notification_check.name
+  description = "Name of EventBridge rule for notification checks"
 }
 
 output "eventbridge_schedule" {
-  value       = aws_cloudwatch_event_rule.daily_notification_check.schedule_expression
+  value       = aws_cloudwatch_event_rule.minutely_notification_check.schedule_expression
   description = "Cron schedule for notification checks"
 }
\ No newline at end of file
@@ -15,9 +15,20 @@ resource "aws_lambda_function" "notification_lambda" {
 
   environment {
     variables = {
-      EVENTS_TABLE  = aws_dynamodb_table.events_table.name
-      USERS_TABLE   = aws_dynamodb_table.users_table.name
-      SNS_TOPIC_ARN = aws_sns_topic.event_reminders.arn
+      EVENTS_TABLE            = aws_dynamodb_table.events_table.name
+      EVENTS_DATE_INDEX       = "DateIndex"
+      REMINDER_SCHEDULE_TABLE = aws_dynamodb_table.reminder_schedule_table.name
+      REMINDER_SHARDS         = "4" # must match the events Lambda
+      USERS_TABLE             = aws_dynamodb_table.users_table.name
+      SNS_TOPIC_ARN           = aws_sns_topic.event_reminders.arn
+      PUBLISH_WORKERS         = "16"
+      SNS_PUBLISH_RATE        = "300" # keep at or below the account's SNS Publish quota
+      LEDGER_TABLE            = aws_dynamodb_table.reminder_ledger.name
+      CHECKPOINT_TABLE        = aws_dynamodb_table.notification_checkpoints.name
+      CHECKPOINT_MARGIN_MS    = "3000" # reserve for checkpointing; drain time is estimated
+      REMINDER_QUEUE_URL      = aws_sqs_queue.reminder_jobs.url
+      DIGEST_DAYS             = "7" # lookahead of the daily {"digest": true} run
+      DIGEST_WEEKDAY          = "0" # Monday, for users without a digestWeekday
     }
   }
 
@@ -25,6 +36,8 @@ resource "aws_lambda_function" "notification_lambda" {
     aws_iam_role_policy.notification_lambda_policy,
     aws_dynamodb_table.events_table,
     aws_dynamodb_table.users_table,
+    aws_dynamodb_table.notification_checkpoints,
+    aws_dynamodb_table.reminder_ledger,
     aws_sns_topic.event_reminders
   ]
 
@@ -34,6 +47,134 @@ resource "aws_lambda_function" "notification_lambda" {
   }
 }
 
+########################################
+# Reminder Delivery Lambda (consumes queued reminder jobs)
+########################################
+
+resource "aws_lambda_function" "notification_delivery_lambda" {
+  function_name = "event-notification-delivery"
+  filename      = "../notify-service/notification.zip"
+  handler       = "notification.delivery_handler"
+  runtime       = "python3.9"
+  role          = aws_iam_role.notification_lambda_role.arn
+  timeout       = 30
+  memory_size   = 256
+
+  environment {
+    variables = {
+      USERS_TABLE      = aws_dynamodb_table.users_table.name
+      SNS_TOPIC_ARN    = aws_sns_topic.event_reminders.arn
+      PUBLISH_WORKERS  = "4"
+      SNS_PUBLISH_RATE = "50" # per invocation; scale with the concurrency limit below
+      LEDGER_TABLE     = aws_dynamodb_table.reminder_ledger.name
+    }
+  }
+
+  depends_on = [
+    aws_iam_role_policy.notification_lambda_policy,
+    aws_dynamodb_table.users_table,
+    aws_dynamodb_table.reminder_ledger,
+    aws_sns_topic.event_reminders
+  ]
+
+  tags = {
+    Project = var.project_name
+    Service = "notifications"
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "reminder_jobs_delivery" {
+  event_source_arn        = aws_sqs_queue.reminder_jobs.arn
+  function_name           = aws_lambda_function.notification_delivery_lambda.arn
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+
+  # Bounds how many deliveries run at once (SNS_PUBLISH_RATE each)
+  scaling_config {
+    maximum_concurrency = 6
+  }
+}
+
+########################################
+# Queue of per-user reminder jobs
+########################################
+
+resource "aws_sqs_queue" "reminder_jobs" {
+  name                       = "reminder-jobs"
+  visibility_timeout_seconds = 180 # six times the delivery Lambda timeout
+  message_retention_seconds  = 86400
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.reminder_jobs_dlq.arn
+    maxReceiveCount     = 5
+  })
+
+  tags = {
+    Project = var.project_name
+    Service = "notifications"
+  }
+}
+
+resource "aws_sqs_queue" "reminder_jobs_dlq" {
+  name                      = "reminder-jobs-dlq"
+  message_retention_seconds = 1209600
+
+  tags = {
+    Project = var.project_name
+    Service = "notifications"
+  }
+}
+
+########################################
+# Checkpoints for runs that continue in a new invocation
+########################################
+
+resource "aws_dynamodb_table" "notification_checkpoints" {
+  name         = "NotificationCheckpoints"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "runId"
+
+  attribute {
+    name = "runId"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Project = var.project_name
+    Service = "notifications"
+  }
+}
+
+########################################
+# Ledger of reminders already sent (dedupes retried runs)
+########################################
+
+resource "aws_dynamodb_table" "reminder_ledger" {
+  name         = "ReminderLedger"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "ledgerKey"
+
+  attribute {
+    name = "ledgerKey"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Project = var.project_name
+    Service = "notifications"
+  }
+}
+
 ########################################
 # IAM Role for Notification Lambda
 ########################################
@@ -85,14 +226,56 @@ resource "aws_iam_role_policy" "notification_lambda_policy" {
         Action = [
           "dynamodb:Scan",
           "dynamodb:Query",
-          "dynamodb:GetItem"
+          "dynamodb:GetItem",
+          "dynamodb:BatchGetItem"
         ]
         Resource = [
           aws_dynamodb_table.events_table.arn,
           "${aws_dynamodb_table.events_table.arn}/index/*",
+          aws_dynamodb_table.reminder_schedule_table.arn,
           aws_dynamodb_table.users_table.arn
         ]
       },
+      # DynamoDB - Sent-reminder ledger
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchGetItem",
+          "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = aws_dynamodb_table.reminder_ledger.arn
+      },
+      # DynamoDB - Run checkpoints
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = aws_dynamodb_table.notification_checkpoints.arn
+      },
+      # Lambda - Continue a long run in a new invocation
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = "arn:aws:lambda:*:*:function:event-notification-service"
+      },
+      # SQS - Reminder jobs between discovery and delivery
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = aws_sqs_queue.reminder_jobs.arn
+      },
       # SNS - Publish Messages
       {
         Effect = "Allow"
@@ -9,3 +9,7 @@ output "api_base_url" {
 output "events_base_url" {
   value = "${aws_api_gateway_deployment.auth_deployment.invoke_url}events"
 }
+
+output "reminder_stream_arn" {
+  value = aws_dynamodb_table.reminder_schedule_table.stream_arn
+}